@@ -1,13 +1,14 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
 from langchain.schema import Document
 
-class AgentState(BaseModel):
+@dataclass(slots=True)
+class AgentState:
     """Base state model for all agents."""
-    documents: List[Document] = Field(default_factory=list)
-    context: Dict[str, Any] = Field(default_factory=dict)
-    errors: List[str] = Field(default_factory=list)
+    documents: List[Document] = field(default_factory=list)
+    context: Dict[str, Any] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
 
 class BaseAgent(ABC):
     """Base class for all agents in the system."""
@@ -47,6 +48,14 @@ class BaseAgent(ABC):
         """
         self.state.errors.append(error)
     
+    def add_errors(self, errors: List[str]) -> None:
+        """Add several errors to the agent's state at once.
+        
+        Args:
+            errors: The error messages to add
+        """
+        self.state.errors.extend(errors)
+    
     def clear_errors(self) -> None:
         """Clear all errors from the agent's state."""
         self.state.errors = []
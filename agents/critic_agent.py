@@ -1,23 +1,83 @@
-from typing import List, Dict, Any
+import asyncio
+import re
+import numpy as np
+import orjson
+from typing import List, Dict, Any, Optional, Set, Tuple
 from langchain.schema import Document
 from .base_agent import BaseAgent
-from llm.ultrasafe_llm import UltraSafeLLM
+from llm.shared import llm
+from llm.semantic_cache import SemanticCache
 from config import settings
 
+_SCORE_PATTERN = re.compile(r"[-+]?\d*\.?\d+")
+
+_QUALITY_PROMPT = """Evaluate the quality of this academic paper and its summary:
+
+Title: {title}
+Content: {head}...
+Summary: {summary}
+
+Consider:
+1. Clarity of writing
+2. Logical flow
+3. Evidence quality
+4. Citation quality
+5. Summary accuracy
+
+Provide a score from 0 to 1."""
+
+_RELEVANCE_PROMPT = """Evaluate the relevance of this academic paper:
+
+Title: {title}
+Summary: {summary}
+
+Consider:
+1. Topic relevance
+2. Timeliness
+3. Impact potential
+4. Field significance
+
+Provide a score from 0 to 1."""
+
+_METHODOLOGY_PROMPT = """Evaluate the methodology of this academic paper:
+
+Title: {title}
+Content: {head}...
+
+Consider:
+1. Research design
+2. Data collection
+3. Analysis methods
+4. Validity
+5. Reproducibility
+
+Provide a score from 0 to 1."""
+
+_CRITIQUE_PROMPT = """Provide a detailed critique of this academic paper:
+
+Title: {title}
+Summary: {summary}
+
+Include:
+1. Strengths
+2. Weaknesses
+3. Methodological concerns
+4. Contribution to field
+5. Recommendations
+
+Respond ONLY with JSON matching this schema:
+{{"strengths": [string], "weaknesses": [string], "methodological_concerns": [string], "contribution": string, "recommendations": [string]}}"""
+
 class CriticAgent(BaseAgent):
     """Agent responsible for evaluating information quality and relevance."""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[SemanticCache] = None):
         super().__init__(
             name="CriticAgent",
             description="Evaluates the quality and relevance of information"
         )
-        self.llm = UltraSafeLLM(
-            api_key=settings.ULTRASAFE_API_KEY,
-            model=settings.ULTRASAFE_MODEL,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
-        )
+        self.llm = llm
+        self.cache = cache or SemanticCache()
     
     async def process(self, documents: List[Document], summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Evaluate documents and their summaries.
@@ -25,30 +85,80 @@ class CriticAgent(BaseAgent):
         Args:
             documents: List of original documents
             summaries: List of document summaries
-            
+        
         Returns:
             Evaluation results
         """
+        if not documents or not summaries:
+            return {"evaluations": [], "average_scores": {}}
+        
         try:
+            pairs = list(zip(documents, summaries))
+            
+            # Look up per-document fields once and share them across all prompts
+            titles = [doc.metadata.get("title", "") for doc, _ in pairs]
+            heads = [doc.metadata.get("_head_1k") or doc.page_content[:1000] for doc, _ in pairs]
+            
+            # Reuse evaluations of documents that were already scored
+            cache_keys = [
+                (f"{title}\n{head}", doc.metadata.get("url") or title)
+                for (doc, _), title, head in zip(pairs, titles, heads)
+            ]
             evaluations = []
-            for doc, summary in zip(documents, summaries):
-                # Evaluate document quality
-                quality_score = await self._evaluate_quality(doc, summary)
-                
-                # Evaluate relevance
-                relevance_score = await self._evaluate_relevance(doc, summary)
+            for (_, summary), title, head, (text, context) in zip(pairs, titles, heads, cache_keys):
+                if len(head.strip()) < settings.MIN_CONTENT_CHARS or not summary.get("summary"):
+                    # Too little to evaluate; scoring it would only waste LLM calls
+                    evaluations.append(self._empty_evaluation(title))
+                else:
+                    evaluations.append(self.cache.lookup(text, context=context))
+            misses = [i for i, evaluation in enumerate(evaluations) if evaluation is None]
+            
+            # Embed the exact-match misses once, in one batch off the event loop,
+            # and reuse the vectors for the semantic lookup and the later update
+            vectors = {}
+            if misses:
+                embedded = await asyncio.to_thread(self.cache.embed, [cache_keys[i][0] for i in misses])
+                if embedded is not None:
+                    vectors = dict(zip(misses, embedded))
+                    for i in misses:
+                        text, context = cache_keys[i]
+                        evaluations[i] = self.cache.lookup(text, context=context, vector=vectors[i])
+                    misses = [i for i in misses if evaluations[i] is None]
+            
+            if misses:
+                miss_titles = [titles[i] for i in misses]
+                miss_heads = [heads[i] for i in misses]
+                miss_summaries = [pairs[i][1] for i in misses]
                 
-                # Evaluate methodology
-                methodology_score = await self._evaluate_methodology(doc)
+                # One batched request per evaluation type rather than four per document
+                (
+                    (quality_scores, quality_failed),
+                    (relevance_scores, relevance_failed),
+                    (methodology_scores, methodology_failed),
+                    (critiques, critique_failed)
+                ) = await asyncio.gather(
+                    self._evaluate_quality(miss_titles, miss_heads, miss_summaries),
+                    self._evaluate_relevance(miss_titles, miss_summaries),
+                    self._evaluate_methodology(miss_titles, miss_heads),
+                    self._generate_critique(miss_titles, miss_summaries)
+                )
                 
-                evaluations.append({
-                    "title": doc.metadata.get("title", ""),
-                    "quality_score": quality_score,
-                    "relevance_score": relevance_score,
-                    "methodology_score": methodology_score,
-                    "overall_score": (quality_score + relevance_score + methodology_score) / 3,
-                    "critique": await self._generate_critique(doc, summary)
-                })
+                # Only cache documents that evaluated cleanly, never fallback scores
+                failed = quality_failed | relevance_failed | methodology_failed | critique_failed
+                for position, (i, quality_score, relevance_score, methodology_score, critique) in enumerate(zip(
+                    misses, quality_scores, relevance_scores, methodology_scores, critiques
+                )):
+                    evaluations[i] = {
+                        "title": titles[i],
+                        "quality_score": quality_score,
+                        "relevance_score": relevance_score,
+                        "methodology_score": methodology_score,
+                        "overall_score": (quality_score + relevance_score + methodology_score) / 3,
+                        "critique": critique
+                    }
+                    if position not in failed:
+                        text, context = cache_keys[i]
+                        self.cache.update(text, evaluations[i], context=context, vector=vectors.get(i))
             
             # Update agent state
             self.update_state(context={"evaluations": evaluations})
@@ -57,162 +167,194 @@ class CriticAgent(BaseAgent):
                 "evaluations": evaluations,
                 "average_scores": self._calculate_average_scores(evaluations)
             }
-            
+        
         except Exception as e:
             self.add_error(f"Error evaluating documents: {str(e)}")
             return {"evaluations": [], "average_scores": {}}
     
-    async def _evaluate_quality(self, doc: Document, summary: Dict[str, Any]) -> float:
-        """Evaluate the quality of a document and its summary.
+    async def _evaluate_quality(self, titles: List[str], heads: List[str], summaries: List[Dict[str, Any]]) -> Tuple[List[float], Set[int]]:
+        """Evaluate the quality of documents and their summaries.
         
         Args:
-            doc: Original document
-            summary: Document summary
-            
+            titles: Document titles
+            heads: First 1000 characters of each document
+            summaries: Document summaries
+        
         Returns:
-            Quality score (0-1)
+            Quality scores (0-1), one per document, and the indices that failed
         """
         try:
-            prompt = f"""
-            Evaluate the quality of this academic paper and its summary:
-            
-            Title: {doc.metadata.get('title', '')}
-            Content: {doc.page_content[:1000]}...
-            Summary: {summary['summary']}
-            
-            Consider:
-            1. Clarity of writing
-            2. Logical flow
-            3. Evidence quality
-            4. Citation quality
-            5. Summary accuracy
-            
-            Provide a score from 0 to 1.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            score = float(response.generations[0][0].text.strip())
-            return min(max(score, 0), 1)
+            prompts = [
+                _QUALITY_PROMPT.format(title=title, head=head, summary=summary['summary'])
+                for title, head, summary in zip(titles, heads, summaries)
+            ]
             
+            responses = await self._generate(prompts)
+            return self._parse_scores(responses, "quality")
+        
         except Exception as e:
             self.add_error(f"Error evaluating quality: {str(e)}")
-            return 0.0
+            return [0.0] * len(titles), set(range(len(titles)))
     
-    async def _evaluate_relevance(self, doc: Document, summary: Dict[str, Any]) -> float:
-        """Evaluate the relevance of a document.
+    async def _evaluate_relevance(self, titles: List[str], summaries: List[Dict[str, Any]]) -> Tuple[List[float], Set[int]]:
+        """Evaluate the relevance of documents.
         
         Args:
-            doc: Original document
-            summary: Document summary
-            
+            titles: Document titles
+            summaries: Document summaries
+        
         Returns:
-            Relevance score (0-1)
+            Relevance scores (0-1), one per document, and the indices that failed
         """
         try:
-            prompt = f"""
-            Evaluate the relevance of this academic paper:
-            
-            Title: {doc.metadata.get('title', '')}
-            Summary: {summary['summary']}
-            
-            Consider:
-            1. Topic relevance
-            2. Timeliness
-            3. Impact potential
-            4. Field significance
-            
-            Provide a score from 0 to 1.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            score = float(response.generations[0][0].text.strip())
-            return min(max(score, 0), 1)
+            prompts = [
+                _RELEVANCE_PROMPT.format(title=title, summary=summary['summary'])
+                for title, summary in zip(titles, summaries)
+            ]
             
+            responses = await self._generate(prompts)
+            return self._parse_scores(responses, "relevance")
+        
         except Exception as e:
             self.add_error(f"Error evaluating relevance: {str(e)}")
-            return 0.0
+            return [0.0] * len(titles), set(range(len(titles)))
     
-    async def _evaluate_methodology(self, doc: Document) -> float:
-        """Evaluate the methodology of a document.
+    async def _evaluate_methodology(self, titles: List[str], heads: List[str]) -> Tuple[List[float], Set[int]]:
+        """Evaluate the methodology of documents.
         
         Args:
-            doc: Original document
-            
+            titles: Document titles
+            heads: First 1000 characters of each document
+        
         Returns:
-            Methodology score (0-1)
+            Methodology scores (0-1), one per document, and the indices that failed
         """
         try:
-            prompt = f"""
-            Evaluate the methodology of this academic paper:
-            
-            Title: {doc.metadata.get('title', '')}
-            Content: {doc.page_content[:1000]}...
-            
-            Consider:
-            1. Research design
-            2. Data collection
-            3. Analysis methods
-            4. Validity
-            5. Reproducibility
-            
-            Provide a score from 0 to 1.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            score = float(response.generations[0][0].text.strip())
-            return min(max(score, 0), 1)
+            prompts = [
+                _METHODOLOGY_PROMPT.format(title=title, head=head)
+                for title, head in zip(titles, heads)
+            ]
             
+            responses = await self._generate(prompts)
+            return self._parse_scores(responses, "methodology")
+        
         except Exception as e:
             self.add_error(f"Error evaluating methodology: {str(e)}")
-            return 0.0
+            return [0.0] * len(titles), set(range(len(titles)))
     
-    async def _generate_critique(self, doc: Document, summary: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate a detailed critique of the document.
+    async def _generate_critique(self, titles: List[str], summaries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Set[int]]:
+        """Generate a detailed critique of each document.
         
         Args:
-            doc: Original document
-            summary: Document summary
-            
+            titles: Document titles
+            summaries: Document summaries
+        
         Returns:
-            Dictionary containing critique
+            List of dictionaries containing critiques, one per document, and the indices that failed
         """
         try:
-            prompt = f"""
-            Provide a detailed critique of this academic paper:
-            
-            Title: {doc.metadata.get('title', '')}
-            Summary: {summary['summary']}
-            
-            Include:
-            1. Strengths
-            2. Weaknesses
-            3. Methodological concerns
-            4. Contribution to field
-            5. Recommendations
-            
-            Format as a structured dictionary.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            critique = eval(response.generations[0][0].text)
-            return critique
-            
+            prompts = [
+                _CRITIQUE_PROMPT.format(title=title, summary=summary['summary'])
+                for title, summary in zip(titles, summaries)
+            ]
+            
+            responses = await self._generate(prompts)
+            
+            critiques = []
+            errors = []
+            failed = set()
+            for index, response in enumerate(responses):
+                try:
+                    if isinstance(response, Exception):
+                        raise response
+                    critiques.append(orjson.loads(response))
+                except Exception as e:
+                    errors.append(f"Error generating critique: {str(e)}")
+                    failed.add(index)
+                    critiques.append(self._empty_critique())
+            self.add_errors(errors)
+            return critiques, failed
+        
         except Exception as e:
             self.add_error(f"Error generating critique: {str(e)}")
-            return {
-                "strengths": [],
-                "weaknesses": [],
-                "methodological_concerns": [],
-                "contribution": "",
-                "recommendations": []
-            }
+            return [self._empty_critique() for _ in titles], set(range(len(titles)))
+    
+    async def _generate(self, prompts: List[str]) -> List[Any]:
+        """Send each prompt as its own call, so one failure doesn't discard the others.
+        
+        Args:
+            prompts: Prompts to send
+        
+        Returns:
+            Response text, or the raised exception, for each prompt
+        """
+        return await asyncio.gather(
+            *[self.llm.ainvoke(prompt) for prompt in prompts],
+            return_exceptions=True
+        )
+    
+    def _parse_scores(self, responses: List[Any], label: str) -> Tuple[List[float], Set[int]]:
+        """Parse a batch of LLM responses into clipped scores.
+        
+        Args:
+            responses: Response text, or the raised exception, for each prompt
+            label: Name of the evaluation, used in error messages
+        
+        Returns:
+            Scores (0-1), with 0.0 for failed or unparseable responses, and
+            the indices of those responses
+        """
+        raw_scores = []
+        errors = []
+        failed = set()
+        for index, response in enumerate(responses):
+            if isinstance(response, Exception):
+                errors.append(f"Error evaluating {label}: {str(response)}")
+                failed.add(index)
+                raw_scores.append(0.0)
+                continue
+            
+            # Tolerate answers such as "Score: 0.8" instead of a bare number
+            match = _SCORE_PATTERN.search(response)
+            if match:
+                raw_scores.append(float(match.group()))
+            else:
+                errors.append(f"Error evaluating {label}: no score in response {response!r}")
+                failed.add(index)
+                raw_scores.append(0.0)
+        self.add_errors(errors)
+        
+        # float64 so scores such as 0.8 round-trip exactly into the report JSON
+        scores = np.clip(np.asarray(raw_scores, dtype=np.float64), 0.0, 1.0)
+        return scores.tolist(), failed
+    
+    def _empty_evaluation(self, title: str) -> Dict[str, Any]:
+        """Return the zero-score evaluation used for documents that are skipped."""
+        return {
+            "title": title,
+            "quality_score": 0.0,
+            "relevance_score": 0.0,
+            "methodology_score": 0.0,
+            "overall_score": 0.0,
+            "critique": self._empty_critique()
+        }
+    
+    def _empty_critique(self) -> Dict[str, Any]:
+        """Return the critique used when generation fails."""
+        return {
+            "strengths": [],
+            "weaknesses": [],
+            "methodological_concerns": [],
+            "contribution": "",
+            "recommendations": []
+        }
     
     def _calculate_average_scores(self, evaluations: List[Dict[str, Any]]) -> Dict[str, float]:
         """Calculate average scores across all evaluations.
         
         Args:
             evaluations: List of evaluations
-            
+        
         Returns:
             Dictionary of average scores
         """
@@ -220,10 +362,13 @@ class CriticAgent(BaseAgent):
             if not evaluations:
                 return {}
             
-            total_quality = sum(e["quality_score"] for e in evaluations)
-            total_relevance = sum(e["relevance_score"] for e in evaluations)
-            total_methodology = sum(e["methodology_score"] for e in evaluations)
-            total_overall = sum(e["overall_score"] for e in evaluations)
+            # Accumulate all four totals in one pass
+            total_quality = total_relevance = total_methodology = total_overall = 0.0
+            for e in evaluations:
+                total_quality += e["quality_score"]
+                total_relevance += e["relevance_score"]
+                total_methodology += e["methodology_score"]
+                total_overall += e["overall_score"]
             
             n = len(evaluations)
             return {
@@ -232,7 +377,7 @@ class CriticAgent(BaseAgent):
                 "average_methodology": total_methodology / n,
                 "average_overall": total_overall / n
             }
-            
+        
         except Exception as e:
             self.add_error(f"Error calculating average scores: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
\ No newline at end of file
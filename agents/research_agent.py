@@ -3,6 +3,7 @@ from langchain.schema import Document
 from .base_agent import BaseAgent
 from rag.retriever import HybridRetriever
 from utils.pdf_parser import PDFParser
+from config import settings
 
 class ResearchAgent(BaseAgent):
     """Agent responsible for retrieving and processing academic papers."""
@@ -28,12 +29,13 @@ class ResearchAgent(BaseAgent):
             # Retrieve relevant documents
             documents = await self.retriever.retrieve(query)
             
-            # Filter by relevance
-            filtered_docs = await self.filter_by_relevance(documents)
-            
-            # Extract metadata
-            for doc in filtered_docs:
-                doc.metadata.update(await self.extract_metadata(doc))
+            # Filter by relevance and extract metadata in a single pass
+            threshold = settings.MIN_RELEVANCE_SCORE
+            filtered_docs = []
+            for doc in documents:
+                if doc.metadata.get("relevance_score", 0) > threshold:
+                    doc.metadata.update(self.extract_metadata(doc))
+                    filtered_docs.append(doc)
             
             # Update agent state
             self.update_state(context={"documents": filtered_docs})
@@ -54,10 +56,11 @@ class ResearchAgent(BaseAgent):
             Filtered list of documents
         """
         try:
-            # Filter documents with relevance score > 0.5
+            # Filter documents above the configured relevance threshold
+            threshold = settings.MIN_RELEVANCE_SCORE
             filtered_docs = [
                 doc for doc in documents
-                if doc.metadata.get("relevance_score", 0) > 0.5
+                if doc.metadata.get("relevance_score", 0) > threshold
             ]
             return filtered_docs
             
@@ -65,7 +68,7 @@ class ResearchAgent(BaseAgent):
             self.add_error(f"Error filtering documents: {str(e)}")
             return documents
     
-    async def extract_metadata(self, doc: Document) -> Dict[str, Any]:
+    def extract_metadata(self, doc: Document) -> Dict[str, Any]:
         """Extract metadata from document.
         
         Args:
@@ -75,22 +78,19 @@ class ResearchAgent(BaseAgent):
             Dictionary of metadata
         """
         try:
-            # Extract basic metadata
-            metadata = {
-                "title": doc.metadata.get("title", ""),
-                "authors": doc.metadata.get("authors", []),
-                "year": doc.metadata.get("year", ""),
-                "source": doc.metadata.get("source", ""),
-                "url": doc.metadata.get("url", ""),
-                "relevance_score": doc.metadata.get("relevance_score", 0)
+            # Fill in defaults for missing basic fields; existing metadata wins.
+            # The content head is sliced once here and reused by downstream agents.
+            return {
+                "title": "",
+                "authors": [],
+                "year": "",
+                "source": "",
+                "url": "",
+                "relevance_score": 0,
+                **doc.metadata,
+                "_head_1k": doc.page_content[:1000]
             }
             
-            # Extract additional metadata if available
-            if hasattr(doc, "metadata") and isinstance(doc.metadata, dict):
-                metadata.update(doc.metadata)
-            
-            return metadata
-            
         except Exception as e:
             self.add_error(f"Error extracting metadata: {str(e)}")
             return {} 
\ No newline at end of file
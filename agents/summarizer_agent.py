@@ -1,11 +1,27 @@
-from typing import List, Dict, Any
+import asyncio
+import hashlib
+import orjson
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
 from langchain.schema import Document
 from .base_agent import BaseAgent
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.summarize import load_summarize_chain
-from llm.ultrasafe_llm import UltraSafeLLM
+from llm.shared import llm
 from config import settings
 
+# Same wording as LangChain's default map_reduce summarization prompt, used for every step
+_SUMMARY_PROMPT = """Write a concise summary of the following:
+
+
+"{text}"
+
+
+CONCISE SUMMARY:"""
+
+# Token budget for the text of one reduce call, as in LangChain's map_reduce chain
+_REDUCE_TOKEN_MAX = 3000
+_MAX_COLLAPSE_ROUNDS = 5
+
 class SummarizerAgent(BaseAgent):
     """Agent responsible for summarizing academic papers."""
     
@@ -20,17 +36,9 @@ class SummarizerAgent(BaseAgent):
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap
         )
-        self.llm = UltraSafeLLM(
-            api_key=settings.ULTRASAFE_API_KEY,
-            model=settings.ULTRASAFE_MODEL,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
-        )
-        self.summarize_chain = load_summarize_chain(
-            self.llm,
-            chain_type="map_reduce",
-            verbose=True
-        )
+        self.llm = llm
+        self._split_cache: "OrderedDict[bytes, Tuple[str, ...]]" = OrderedDict()
+        self._split_cache_size = 1024
     
     async def process(self, documents: List[Document]) -> List[Dict[str, Any]]:
         """Process documents and extract key information.
@@ -41,24 +49,48 @@ class SummarizerAgent(BaseAgent):
         Returns:
             List of summaries with key information
         """
+        if not documents:
+            return []
+        
         try:
-            summaries = []
-            for doc in documents:
-                # Split document into chunks
-                chunks = self.text_splitter.split_documents([doc])
+            semaphore = asyncio.Semaphore(settings.MAX_CONCURRENCY)
+            
+            async def _summarize_one(doc: Document) -> Dict[str, Any]:
+                if len(doc.page_content.strip()) < settings.MIN_CONTENT_CHARS:
+                    # Too little text to summarize; skip the LLM calls
+                    return self._empty_summary(doc)
                 
-                # Generate summary
-                summary = await self.summarize_chain.arun(chunks)
+                # Split document into chunks
+                chunks = self._split_text(doc.page_content)
                 
-                # Extract key information
-                key_info = await self._extract_key_information(doc, summary)
+                async with semaphore:
+                    # Generate summary
+                    summary = await self._summarize_chunks(chunks)
+                    
+                    # Extract key information
+                    key_info = await self._extract_key_information(doc, summary)
                 
-                summaries.append({
+                return {
                     "title": doc.metadata.get("title", ""),
                     "summary": summary,
                     "key_findings": key_info,
-                    "metadata": doc.metadata
-                })
+                    "metadata": self._public_metadata(doc)
+                }
+            
+            results = await asyncio.gather(
+                *[_summarize_one(doc) for doc in documents],
+                return_exceptions=True
+            )
+            
+            # Keep one entry per document so summaries stay aligned with documents
+            summaries = []
+            errors = []
+            for doc, result in zip(documents, results):
+                if isinstance(result, Exception):
+                    errors.append(f"Error summarizing document: {str(result)}")
+                    result = self._empty_summary(doc)
+                summaries.append(result)
+            self.add_errors(errors)
             
             # Update agent state
             self.update_state(context={"summaries": summaries})
@@ -69,6 +101,117 @@ class SummarizerAgent(BaseAgent):
             self.add_error(f"Error summarizing documents: {str(e)}")
             return []
     
+    def _split_text(self, text: str) -> Tuple[str, ...]:
+        """Split text into chunks, reusing earlier splits of identical content.
+        
+        Args:
+            text: Document text
+            
+        Returns:
+            Text chunks
+        """
+        # blake2b is much faster than sha256 and collisions are not a security concern here
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        chunks = self._split_cache.get(key)
+        if chunks is not None:
+            self._split_cache.move_to_end(key)
+            return chunks
+        
+        chunks = tuple(self.text_splitter.split_text(text))
+        self._split_cache[key] = chunks
+        if len(self._split_cache) > self._split_cache_size:
+            self._split_cache.popitem(last=False)
+        return chunks
+    
+    async def _summarize_chunks(self, chunks: Tuple[str, ...]) -> str:
+        """Summarize a document's chunks with a map-reduce pass.
+        
+        The map step is one batched request, so every chunk is summarized
+        concurrently. While the partial summaries exceed the reduce token budget,
+        they are collapsed in groups that fit it; the rest are combined in one call.
+        
+        Args:
+            chunks: Document text chunks
+            
+        Returns:
+            Summary text
+        """
+        partials = await self._summarize_texts(list(chunks))
+        if len(partials) == 1:
+            return partials[0]
+        
+        # Collapse groups of partial summaries until they fit a single reduce call
+        for _ in range(_MAX_COLLAPSE_ROUNDS):
+            groups = self._group_by_tokens(partials)
+            if len(groups) == 1:
+                break
+            partials = await self._summarize_texts(["\n\n".join(group) for group in groups])
+        
+        summaries = await self._summarize_texts(["\n\n".join(partials)])
+        return summaries[0]
+    
+    async def _summarize_texts(self, texts: List[str]) -> List[str]:
+        """Summarize each text, concurrently in one batched request.
+        
+        Args:
+            texts: Texts to summarize
+            
+        Returns:
+            One summary per text
+        """
+        response = await self.llm.agenerate([_SUMMARY_PROMPT.format(text=text) for text in texts])
+        return [generation[0].text.strip() for generation in response.generations]
+    
+    def _group_by_tokens(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into consecutive groups that each fit the reduce token budget.
+        
+        Args:
+            texts: Partial summaries
+            
+        Returns:
+            Groups of texts; a single text over the budget forms its own group
+        """
+        groups: List[List[str]] = [[]]
+        group_tokens = 0
+        for text in texts:
+            tokens = self.llm.get_num_tokens(text)
+            if groups[-1] and group_tokens + tokens > _REDUCE_TOKEN_MAX:
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(text)
+            group_tokens += tokens
+        return groups
+    
+    def _empty_summary(self, doc: Document) -> Dict[str, Any]:
+        """Return the placeholder summary for a document that was not summarized.
+        
+        Args:
+            doc: Source document
+            
+        Returns:
+            Summary with empty text and findings
+        """
+        return {
+            "title": doc.metadata.get("title", ""),
+            "summary": "",
+            "key_findings": {},
+            "metadata": self._public_metadata(doc)
+        }
+    
+    def _public_metadata(self, doc: Document) -> Dict[str, Any]:
+        """Return document metadata without internal underscore-prefixed keys.
+        
+        Summaries are embedded in downstream prompts, so cached values such as
+        the content head must not travel with them.
+        
+        Args:
+            doc: Source document
+            
+        Returns:
+            Metadata dictionary
+        """
+        return {k: v for k, v in doc.metadata.items() if not k.startswith("_")}
+    
     async def _extract_key_information(self, doc: Document, summary: str) -> Dict[str, Any]:
         """Extract key information from document and summary.
         
@@ -93,11 +236,12 @@ class SummarizerAgent(BaseAgent):
             4. Limitations
             5. Future work
             
-            Format as a structured dictionary.
+            Respond ONLY with JSON matching this schema:
+            {{"main_question": string, "methodologies": [string], "findings": [string], "limitations": [string], "future_work": [string]}}
             """
             
             response = await self.llm.agenerate([prompt])
-            key_info = eval(response.generations[0][0].text)
+            key_info = orjson.loads(response.generations[0][0].text)
             
             return key_info
             
@@ -121,14 +265,37 @@ class SummarizerAgent(BaseAgent):
             Synthesized information
         """
         try:
-            # Combine summaries for synthesis
-            combined_text = "\n\n".join([
-                f"Title: {s['title']}\nSummary: {s['summary']}"
-                for s in summaries
-            ])
+            response = await self.llm.agenerate([self._build_synthesis_prompt(summaries)])
+            synthesis = orjson.loads(response.generations[0][0].text)
             
-            # Generate synthesis using LLM
-            prompt = f"""
+            return synthesis
+            
+        except Exception as e:
+            self.add_error(f"Error synthesizing documents: {str(e)}")
+            return {
+                "common_themes": [],
+                "conflicting_findings": [],
+                "complementary_insights": [],
+                "research_gaps": [],
+                "future_directions": []
+            }
+    
+    def _build_synthesis_prompt(self, summaries: List[Dict[str, Any]]) -> str:
+        """Build the cross-document synthesis prompt.
+        
+        Args:
+            summaries: List of document summaries
+            
+        Returns:
+            Prompt text
+        """
+        # Combine summaries for synthesis
+        combined_text = "\n\n".join([
+            f"Title: {s['title']}\nSummary: {s['summary']}"
+            for s in summaries
+        ])
+        
+        return f"""
             Synthesize key insights from the following academic papers:
             
             {combined_text}
@@ -140,20 +307,6 @@ class SummarizerAgent(BaseAgent):
             4. Research gaps
             5. Future directions
             
-            Format as a structured dictionary.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            synthesis = eval(response.generations[0][0].text)
-            
-            return synthesis
-            
-        except Exception as e:
-            self.add_error(f"Error synthesizing documents: {str(e)}")
-            return {
-                "common_themes": [],
-                "conflicting_findings": [],
-                "complementary_insights": [],
-                "research_gaps": [],
-                "future_directions": []
-            } 
\ No newline at end of file
+            Respond ONLY with JSON matching this schema:
+            {{"common_themes": [string], "conflicting_findings": [string], "complementary_insights": [string], "research_gaps": [string], "future_directions": [string]}}
+            """
\ No newline at end of file
@@ -1,12 +1,107 @@
+import asyncio
 from typing import List, Dict, Any
 from langchain.schema import Document
 from .base_agent import BaseAgent
-from llm.ultrasafe_llm import UltraSafeLLM
+from llm.shared import llm
 from config import settings
-import json
+import orjson
 import os
 from datetime import datetime
 
+_REPAIR_PROMPT = """The following text was meant to be valid JSON but could not be parsed:
+
+{text}
+
+Respond ONLY with the corrected JSON, preserving its content."""
+
+_EXECUTIVE_SUMMARY_PROMPT = """Generate an executive summary for this research report:
+
+Query: {query}
+
+Key Findings:
+{synthesis_json}
+
+Document Quality:
+{scores_json}
+
+Focus on:
+1. Main research question
+2. Key findings
+3. Quality of evidence
+4. Major implications
+5. Recommendations
+
+Write in a clear, concise style suitable for executive readers."""
+
+_METHODOLOGY_PROMPT = """Generate a methodology section for this research report:
+
+Documents Analyzed: {num_documents}
+Quality Scores: {scores_json}
+
+Include:
+1. Research approach
+2. Document selection criteria
+3. Analysis methods
+4. Quality assessment
+5. Limitations
+
+Respond ONLY with JSON matching this schema:
+{{"research_approach": string, "selection_criteria": string, "analysis_methods": string, "quality_assessment": string, "limitations": [string]}}"""
+
+_FINDINGS_PROMPT = """Generate a findings section for this research report:
+
+Document Summaries:
+{summaries_json}
+
+Synthesis:
+{synthesis_json}
+
+Include:
+1. Key findings by theme
+2. Supporting evidence
+3. Contradictory findings
+4. Emerging patterns
+5. Knowledge gaps
+
+Respond ONLY with JSON matching this schema:
+{{"key_findings": [{{"theme": string, "findings": [string]}}], "supporting_evidence": [string], "contradictory_findings": [string], "emerging_patterns": [string], "knowledge_gaps": [string]}}"""
+
+_ANALYSIS_PROMPT = """Generate an analysis section for this research report:
+
+Evaluations:
+{evaluations_json}
+
+Synthesis:
+{synthesis_json}
+
+Include:
+1. Critical analysis of findings
+2. Quality assessment
+3. Reliability of evidence
+4. Implications
+5. Future research needs
+
+Respond ONLY with JSON matching this schema:
+{{"critical_analysis": string, "quality_assessment": string, "evidence_reliability": string, "implications": [string], "future_research": [string]}}"""
+
+_RECOMMENDATIONS_PROMPT = """Generate recommendations based on this research:
+
+Synthesis:
+{synthesis_json}
+
+Quality Assessment:
+{scores_json}
+
+Include:
+1. Research recommendations
+2. Practical implications
+3. Policy recommendations
+4. Implementation suggestions
+5. Future directions
+
+Respond ONLY with a JSON array matching this schema:
+[{{"category": string, "recommendation": string}}]"""
+
 class WriterAgent(BaseAgent):
     """Agent responsible for compiling research findings into reports."""
     
@@ -15,12 +110,7 @@ class WriterAgent(BaseAgent):
             name="WriterAgent",
             description="Compiles research findings into structured reports"
         )
-        self.llm = UltraSafeLLM(
-            api_key=settings.ULTRASAFE_API_KEY,
-            model=settings.ULTRASAFE_MODEL,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS
-        )
+        self.llm = llm
         self.output_dir = output_dir or settings.DATA_DIR
         os.makedirs(self.output_dir, exist_ok=True)
     
@@ -45,42 +135,49 @@ class WriterAgent(BaseAgent):
             Generated report
         """
         try:
-            # Generate report sections
-            executive_summary = await self._generate_executive_summary(
-                query, summaries, evaluations, synthesis
-            )
-            
-            methodology = await self._generate_methodology_section(
-                documents, evaluations
-            )
-            
-            findings = await self._generate_findings_section(
-                summaries, synthesis
-            )
-            
-            analysis = await self._generate_analysis_section(
-                evaluations, synthesis
-            )
-            
-            recommendations = await self._generate_recommendations(
-                synthesis, evaluations
+            # Serialize each input once; several prompts embed the same blobs
+            synthesis_json = orjson.dumps(synthesis, option=orjson.OPT_INDENT_2).decode()
+            scores_json = orjson.dumps(evaluations.get('average_scores', {}), option=orjson.OPT_INDENT_2).decode()
+            evaluations_json = orjson.dumps(evaluations, option=orjson.OPT_INDENT_2).decode()
+            summaries_json = orjson.dumps(summaries, option=orjson.OPT_INDENT_2).decode()
+            now = datetime.now()
+            
+            # References don't depend on the LLM, so build them while it works
+            references_task = asyncio.create_task(asyncio.to_thread(self._generate_references, documents))
+            
+            # Build every section prompt up front and request them concurrently
+            prompts = [
+                self._executive_summary_prompt(query, synthesis_json, scores_json),
+                self._methodology_prompt(len(documents), scores_json),
+                self._findings_prompt(summaries_json, synthesis_json),
+                self._analysis_prompt(evaluations_json, synthesis_json),
+                self._recommendations_prompt(synthesis_json, scores_json)
+            ]
+            texts = await self._generate_sections(prompts)
+            
+            executive_summary = self._parse_text_section(texts[0], "executive summary")
+            methodology, findings, analysis, recommendations = await asyncio.gather(
+                self._parse_json_section(texts[1], {}, "methodology section"),
+                self._parse_json_section(texts[2], {}, "findings section"),
+                self._parse_json_section(texts[3], {}, "analysis section"),
+                self._parse_json_section(texts[4], [], "recommendations")
             )
             
             # Compile full report
             report = {
                 "title": f"Research Report: {query}",
-                "date": datetime.now().strftime("%Y-%m-%d"),
+                "date": now.strftime("%Y-%m-%d"),
                 "query": query,
                 "executive_summary": executive_summary,
                 "methodology": methodology,
                 "findings": findings,
                 "analysis": analysis,
                 "recommendations": recommendations,
-                "references": self._generate_references(documents)
+                "references": await references_task
             }
             
             # Save report
-            report_path = await self._save_report(report)
+            report_path = await self._save_report(report, now)
             
             # Update agent state
             self.update_state(context={"report": report, "report_path": report_path})
@@ -91,213 +188,143 @@ class WriterAgent(BaseAgent):
             self.add_error(f"Error generating report: {str(e)}")
             return {}
     
-    async def _generate_executive_summary(
+    async def _generate_sections(self, prompts: List[str]) -> List[Any]:
+        """Generate each prompt as its own call, so one failed section doesn't fail the rest.
+        
+        Args:
+            prompts: Section prompts
+            
+        Returns:
+            Response text, or the raised exception, for each prompt
+        """
+        return await asyncio.gather(
+            *[self.llm.ainvoke(prompt) for prompt in prompts],
+            return_exceptions=True
+        )
+    
+    def _executive_summary_prompt(
         self,
         query: str,
-        summaries: List[Dict[str, Any]],
-        evaluations: Dict[str, Any],
-        synthesis: Dict[str, Any]
+        synthesis_json: str,
+        scores_json: str
     ) -> str:
-        """Generate executive summary.
+        """Build the executive summary prompt.
         
         Args:
             query: Research query
-            summaries: Document summaries
-            evaluations: Document evaluations
-            synthesis: Cross-document synthesis
+            synthesis_json: Serialized cross-document synthesis
+            scores_json: Serialized average evaluation scores
             
         Returns:
-            Executive summary text
+            Prompt text
         """
-        try:
-            prompt = f"""
-            Generate an executive summary for this research report:
-            
-            Query: {query}
-            
-            Key Findings:
-            {json.dumps(synthesis, indent=2)}
-            
-            Document Quality:
-            {json.dumps(evaluations['average_scores'], indent=2)}
-            
-            Focus on:
-            1. Main research question
-            2. Key findings
-            3. Quality of evidence
-            4. Major implications
-            5. Recommendations
-            
-            Write in a clear, concise style suitable for executive readers.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            return response.generations[0][0].text.strip()
-            
-        except Exception as e:
-            self.add_error(f"Error generating executive summary: {str(e)}")
-            return ""
+        return _EXECUTIVE_SUMMARY_PROMPT.format(query=query, synthesis_json=synthesis_json, scores_json=scores_json)
     
-    async def _generate_methodology_section(
+    def _methodology_prompt(
         self,
-        documents: List[Document],
-        evaluations: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Generate methodology section.
+        num_documents: int,
+        scores_json: str
+    ) -> str:
+        """Build the methodology section prompt.
         
         Args:
-            documents: List of documents
-            evaluations: Document evaluations
+            num_documents: Number of documents analyzed
+            scores_json: Serialized average evaluation scores
             
         Returns:
-            Methodology section content
+            Prompt text
         """
-        try:
-            prompt = f"""
-            Generate a methodology section for this research report:
-            
-            Documents Analyzed: {len(documents)}
-            Quality Scores: {json.dumps(evaluations['average_scores'], indent=2)}
-            
-            Include:
-            1. Research approach
-            2. Document selection criteria
-            3. Analysis methods
-            4. Quality assessment
-            5. Limitations
-            
-            Format as a structured dictionary.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            return eval(response.generations[0][0].text)
-            
-        except Exception as e:
-            self.add_error(f"Error generating methodology section: {str(e)}")
-            return {}
+        return _METHODOLOGY_PROMPT.format(num_documents=num_documents, scores_json=scores_json)
     
-    async def _generate_findings_section(
+    def _findings_prompt(
         self,
-        summaries: List[Dict[str, Any]],
-        synthesis: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Generate findings section.
+        summaries_json: str,
+        synthesis_json: str
+    ) -> str:
+        """Build the findings section prompt.
         
         Args:
-            summaries: Document summaries
-            synthesis: Cross-document synthesis
+            summaries_json: Serialized document summaries
+            synthesis_json: Serialized cross-document synthesis
             
         Returns:
-            Findings section content
+            Prompt text
         """
-        try:
-            prompt = f"""
-            Generate a findings section for this research report:
-            
-            Document Summaries:
-            {json.dumps(summaries, indent=2)}
-            
-            Synthesis:
-            {json.dumps(synthesis, indent=2)}
-            
-            Include:
-            1. Key findings by theme
-            2. Supporting evidence
-            3. Contradictory findings
-            4. Emerging patterns
-            5. Knowledge gaps
-            
-            Format as a structured dictionary.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            return eval(response.generations[0][0].text)
-            
-        except Exception as e:
-            self.add_error(f"Error generating findings section: {str(e)}")
-            return {}
+        return _FINDINGS_PROMPT.format(summaries_json=summaries_json, synthesis_json=synthesis_json)
     
-    async def _generate_analysis_section(
+    def _analysis_prompt(
         self,
-        evaluations: Dict[str, Any],
-        synthesis: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Generate analysis section.
+        evaluations_json: str,
+        synthesis_json: str
+    ) -> str:
+        """Build the analysis section prompt.
         
         Args:
-            evaluations: Document evaluations
-            synthesis: Cross-document synthesis
+            evaluations_json: Serialized document evaluations
+            synthesis_json: Serialized cross-document synthesis
             
         Returns:
-            Analysis section content
+            Prompt text
         """
-        try:
-            prompt = f"""
-            Generate an analysis section for this research report:
-            
-            Evaluations:
-            {json.dumps(evaluations, indent=2)}
-            
-            Synthesis:
-            {json.dumps(synthesis, indent=2)}
-            
-            Include:
-            1. Critical analysis of findings
-            2. Quality assessment
-            3. Reliability of evidence
-            4. Implications
-            5. Future research needs
-            
-            Format as a structured dictionary.
-            """
-            
-            response = await self.llm.agenerate([prompt])
-            return eval(response.generations[0][0].text)
-            
-        except Exception as e:
-            self.add_error(f"Error generating analysis section: {str(e)}")
-            return {}
+        return _ANALYSIS_PROMPT.format(evaluations_json=evaluations_json, synthesis_json=synthesis_json)
     
-    async def _generate_recommendations(
+    def _recommendations_prompt(
         self,
-        synthesis: Dict[str, Any],
-        evaluations: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Generate recommendations.
+        synthesis_json: str,
+        scores_json: str
+    ) -> str:
+        """Build the recommendations prompt.
         
         Args:
-            synthesis: Cross-document synthesis
-            evaluations: Document evaluations
+            synthesis_json: Serialized cross-document synthesis
+            scores_json: Serialized average evaluation scores
             
         Returns:
-            List of recommendations
+            Prompt text
         """
-        try:
-            prompt = f"""
-            Generate recommendations based on this research:
-            
-            Synthesis:
-            {json.dumps(synthesis, indent=2)}
-            
-            Quality Assessment:
-            {json.dumps(evaluations['average_scores'], indent=2)}
-            
-            Include:
-            1. Research recommendations
-            2. Practical implications
-            3. Policy recommendations
-            4. Implementation suggestions
-            5. Future directions
-            
-            Format as a list of dictionaries with 'category' and 'recommendation' fields.
-            """
+        return _RECOMMENDATIONS_PROMPT.format(synthesis_json=synthesis_json, scores_json=scores_json)
+    
+    def _parse_text_section(self, text: Any, label: str) -> str:
+        """Parse the section's response as free text.
+        
+        Args:
+            text: Generated text, or the exception raised for this section
+            label: Name of the section, used in error messages
             
-            response = await self.llm.agenerate([prompt])
-            return eval(response.generations[0][0].text)
+        Returns:
+            Section text
+        """
+        if isinstance(text, Exception):
+            self.add_error(f"Error generating {label}: {str(text)}")
+            return ""
+        return text.strip()
+    
+    async def _parse_json_section(self, text: Any, default: Any, label: str) -> Any:
+        """Parse the section's response as JSON.
+        
+        Malformed JSON is sent back to the LLM once for repair before the
+        section falls back to its default.
+        
+        Args:
+            text: Generated text, or the exception raised for this section
+            default: Value returned when the section failed
+            label: Name of the section, used in error messages
             
+        Returns:
+            Section content
+        """
+        try:
+            if isinstance(text, Exception):
+                raise text
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                repaired = await self.llm.ainvoke(_REPAIR_PROMPT.format(text=text))
+                return orjson.loads(repaired)
+                
         except Exception as e:
-            self.add_error(f"Error generating recommendations: {str(e)}")
-            return []
+            self.add_error(f"Error generating {label}: {str(e)}")
+            return default
     
     def _generate_references(self, documents: List[Document]) -> List[Dict[str, Any]]:
         """Generate reference list.
@@ -325,27 +352,33 @@ class WriterAgent(BaseAgent):
             self.add_error(f"Error generating references: {str(e)}")
             return []
     
-    async def _save_report(self, report: Dict[str, Any]) -> str:
+    async def _save_report(self, report: Dict[str, Any], now: datetime) -> str:
         """Save report to file.
         
         Args:
             report: Generated report
+            now: Report generation time, used for the filename
             
         Returns:
             Path to saved report
         """
         try:
             # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
             filename = f"report_{timestamp}.json"
             filepath = os.path.join(self.output_dir, filename)
             
-            # Save report
-            with open(filepath, 'w') as f:
-                json.dump(report, f, indent=2)
+            # Serialize and write in a worker thread so the event loop stays free
+            await asyncio.to_thread(self._write_report, report, filepath)
             
             return filepath
             
         except Exception as e:
             self.add_error(f"Error saving report: {str(e)}")
-            return "" 
\ No newline at end of file
+            return "" 
+    
+    @staticmethod
+    def _write_report(report: Dict[str, Any], filepath: str) -> None:
+        """Write a report to disk as indented JSON."""
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
\ No newline at end of file
@@ -1,16 +1,23 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import asyncio
 from datetime import datetime
+import hashlib
 import json
 import os
+import threading
+from cachetools import TTLCache
 
 from agents.research_agent import ResearchAgent
 from agents.summarizer_agent import SummarizerAgent
 from agents.critic_agent import CriticAgent
 from agents.writer_agent import WriterAgent
+from config import settings
 from graph.coordinator import ResearchCoordinator
+from llm.semantic_cache import SemanticCache
+from llm.shared import llm, configure_llm_cache
+from llm.ultrasafe_llm import close_sessions
 from rag.embeddings import EmbeddingsManager
 from rag.retriever import HybridRetriever
 from utils.pdf_parser import PDFParser
@@ -26,11 +33,12 @@ app = FastAPI(
 embeddings_manager = EmbeddingsManager()
 retriever = HybridRetriever(embeddings_manager)
 pdf_parser = PDFParser()
+llm.semantic_cache = SemanticCache(embeddings_manager)
 
 # Initialize agents
 research_agent = ResearchAgent(retriever, pdf_parser)
 summarizer_agent = SummarizerAgent()
-critic_agent = CriticAgent()
+critic_agent = CriticAgent(cache=SemanticCache(embeddings_manager))
 writer_agent = WriterAgent()
 
 # Initialize coordinator
@@ -57,44 +65,109 @@ class ResearchResponse(BaseModel):
     errors: List[str]
     timestamp: str
 
-# Store for research results
-research_results = {}
+# Store for research results; entries expire so memory stays bounded
+research_results = TTLCache(maxsize=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL)
+# Query hash -> query ID, so repeated queries reuse an earlier run
+query_ids = TTLCache(maxsize=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL)
+pending_ids = set()
+results_lock = threading.Lock()
+
+def _query_key(query: str) -> str:
+    """Return the memoization key for a research query."""
+    return hashlib.sha256(query.strip().encode("utf-8")).hexdigest()
+
+def _agent_error_count() -> int:
+    """Total errors recorded by the agents, which swallow failures instead of raising."""
+    agents = (research_agent, summarizer_agent, critic_agent, writer_agent)
+    return sum(len(agent.state.errors) for agent in agents)
 
 async def process_research_task(query_id: str, query: str):
     """Background task to process research query."""
+    errors_before = _agent_error_count()
     try:
         results = await coordinator.process_query(query)
         results["timestamp"] = datetime.now().isoformat()
-        research_results[query_id] = results
     except Exception as e:
-        research_results[query_id] = {
+        results = {
             "error": str(e),
             "timestamp": datetime.now().isoformat()
         }
+    
+    # Agents and graph nodes report failures instead of raising, so a run during an
+    # outage finishes with an empty or partial report. Only clean runs are reused;
+    # errors from concurrent runs may also block reuse, which only costs a rerun.
+    succeeded = (
+        "error" not in results
+        and bool(results.get("report"))
+        and not results.get("errors")
+        and _agent_error_count() == errors_before
+    )
+    
+    with results_lock:
+        pending_ids.discard(query_id)
+        research_results[query_id] = results
+        if not succeeded:
+            # Let the next identical query retry instead of reusing the failure
+            query_ids.pop(_query_key(query), None)
+
+async def research_worker(queue: asyncio.Queue):
+    """Consume research tasks from the queue one at a time."""
+    while True:
+        query_id, query = await queue.get()
+        try:
+            await process_research_task(query_id, query)
+        finally:
+            queue.task_done()
+
+@app.on_event("startup")
+async def startup():
+    """Install the LLM cache and start a bounded pool of research workers."""
+    configure_llm_cache()
+    app.state.research_queue = asyncio.Queue()
+    app.state.research_workers = [
+        asyncio.create_task(research_worker(app.state.research_queue))
+        for _ in range(settings.RESEARCH_WORKERS)
+    ]
 
 @app.post("/research", response_model=Dict[str, str])
-async def start_research(query: ResearchQuery, background_tasks: BackgroundTasks):
+async def start_research(query: ResearchQuery):
     """Start a research task."""
-    query_id = f"research_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    background_tasks.add_task(process_research_task, query_id, query.query)
+    key = _query_key(query.query)
+    with results_lock:
+        existing_id = query_ids.get(key)
+        if existing_id in research_results:
+            return {"query_id": existing_id, "status": "cached"}
+        if existing_id in pending_ids:
+            return {"query_id": existing_id, "status": "processing"}
+        
+        query_id = f"research_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{key[:8]}"
+        query_ids[key] = query_id
+        pending_ids.add(query_id)
+    
+    # Queued rather than started, so a burst of requests cannot overload the LLM API
+    await app.state.research_queue.put((query_id, query.query))
     return {"query_id": query_id, "status": "processing"}
 
 @app.get("/research/{query_id}", response_model=ResearchResponse)
 async def get_research_results(query_id: str):
     """Get research results for a query ID."""
-    if query_id not in research_results:
+    with results_lock:
+        results = research_results.get(query_id)
+    if results is None:
         raise HTTPException(status_code=404, detail="Research task not found")
-    return research_results[query_id]
+    return results
 
 @app.get("/research/{query_id}/status")
 async def get_research_status(query_id: str):
     """Get the status of a research task."""
-    if query_id not in research_results:
+    with results_lock:
+        results = research_results.get(query_id)
+    if results is None:
         raise HTTPException(status_code=404, detail="Research task not found")
     return {
         "query_id": query_id,
-        "status": "completed" if "error" not in research_results[query_id] else "failed",
-        "timestamp": research_results[query_id]["timestamp"]
+        "status": "completed" if "error" not in results else "failed",
+        "timestamp": results["timestamp"]
     }
 
 @app.get("/workflow/status")
@@ -102,6 +175,15 @@ async def get_workflow_status():
     """Get the current status of the workflow."""
     return coordinator.get_workflow_status()
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the research workers and release pooled HTTP connections."""
+    for worker in app.state.research_workers:
+        worker.cancel()
+    await asyncio.gather(*app.state.research_workers, return_exceptions=True)
+    await retriever.web_search.close()
+    await close_sessions()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -109,4 +191,4 @@ async def health_check():
         "status": "healthy",
         "version": "0.1.0",
         "timestamp": datetime.now().isoformat()
-    } 
\ No newline at end of file
+    }
\ No newline at end of file
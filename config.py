@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -6,6 +7,8 @@ class Settings(BaseSettings):
     ULTRASAFE_API_URL: str = "https://api.us.inc/usf/v1/hiring/chat/completions"
     ULTRASAFE_MODEL: str = "usf1-mini"
     ULTRASAFE_API_KEY: str  # This will be loaded from .env file
+    ULTRASAFE_COMPRESS_REQUESTS: bool = False
+    ULTRASAFE_RPM: Optional[int] = 60
     
     # Qdrant Configuration
     QDRANT_URL: str
@@ -27,6 +30,13 @@ class Settings(BaseSettings):
     # Agent Configuration
     ENABLE_WEB_SEARCH: bool = True
     STREAM_RESPONSE: bool = False
+    MAX_CONCURRENCY: int = 8
+    MIN_CONTENT_CHARS: int = 200
+    RESEARCH_WORKERS: int = 4
+    
+    # LLM Cache Configuration
+    ENABLE_LLM_CACHE: bool = True
+    LLM_CACHE_REDIS_URL: Optional[str] = None
     
     # File paths
     DATA_DIR: str = "data"
@@ -39,11 +49,20 @@ class Settings(BaseSettings):
     # API Server Configuration
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
-    API_WORKERS: int = 4
-    API_RELOAD: bool = True
+    # Research results and the task queue live in process memory, so one worker by default
+    API_WORKERS: int = 1
+    # Development only; uvicorn ignores API_WORKERS in reload mode
+    API_RELOAD: bool = False
+    RESULT_CACHE_SIZE: int = 1024
+    RESULT_CACHE_TTL: int = 3600
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the application settings, parsing the environment only once."""
+    return Settings()
+
+settings = get_settings()
\ No newline at end of file
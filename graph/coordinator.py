@@ -1,6 +1,10 @@
+import asyncio
+import functools
+import operator
 from typing import Dict, List, Any, Annotated, TypedDict, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
+from langchain.schema.runnable import RunnableConfig
 from agents.research_agent import ResearchAgent
 from agents.summarizer_agent import SummarizerAgent
 from agents.critic_agent import CriticAgent
@@ -15,7 +19,19 @@ class ResearchState(TypedDict):
     evaluations: Dict[str, Any]
     synthesis: Dict[str, Any]
     report: Dict[str, Any]
-    errors: List[str]
+    # Errors from every node are concatenated rather than overwritten
+    errors: Annotated[List[str], operator.add]
+
+def _dispatch(method_name: str):
+    """Build a graph node that runs a method of the coordinator invoking the graph.
+    
+    The compiled graph is shared by every coordinator, so the instance is
+    passed in through the run config rather than bound into the node.
+    """
+    async def node(state: ResearchState, config: RunnableConfig) -> Dict[str, Any]:
+        coordinator = config["configurable"]["coordinator"]
+        return await getattr(coordinator, method_name)(state)
+    return node
 
 class ResearchCoordinator:
     """Coordinates the research workflow using LangGraph."""
@@ -33,27 +49,31 @@ class ResearchCoordinator:
         self.critic_agent = critic_agent or CriticAgent()
         self.writer_agent = writer_agent or WriterAgent()
         
-        # Create and compile the graph
-        self.workflow = self._create_workflow()
-        self.app = self.workflow.compile()
+        # The graph is compiled once per class and shared between instances
+        self.app = self._compiled_workflow()
     
-    def _create_workflow(self) -> StateGraph:
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _compiled_workflow(cls):
+        """Return the compiled research workflow, compiling it on first use."""
+        return cls._create_workflow().compile()
+    
+    @classmethod
+    def _create_workflow(cls) -> StateGraph:
         """Create the research workflow graph."""
         # Create the graph
         workflow = StateGraph(ResearchState)
         
         # Add nodes
-        workflow.add_node("research", self._research_node)
-        workflow.add_node("summarize", self._summarize_node)
-        workflow.add_node("evaluate", self._evaluate_node)
-        workflow.add_node("synthesize", self._synthesize_node)
-        workflow.add_node("write", self._write_node)
+        workflow.add_node("research", _dispatch("_research_node"))
+        workflow.add_node("summarize", _dispatch("_summarize_node"))
+        workflow.add_node("analyze", _dispatch("_analyze_node"))
+        workflow.add_node("write", _dispatch("_write_node"))
         
         # Add edges
         workflow.add_edge("research", "summarize")
-        workflow.add_edge("summarize", "evaluate")
-        workflow.add_edge("evaluate", "synthesize")
-        workflow.add_edge("synthesize", "write")
+        workflow.add_edge("summarize", "analyze")
+        workflow.add_edge("analyze", "write")
         workflow.add_edge("write", END)
         
         # Set entry point
@@ -61,44 +81,45 @@ class ResearchCoordinator:
         
         return workflow
     
-    async def _research_node(self, state: ResearchState) -> ResearchState:
+    async def _research_node(self, state: ResearchState) -> Dict[str, Any]:
         """Research node that finds relevant documents."""
         try:
             documents = await self.research_agent.process(state["query"])
-            return {**state, "documents": documents}
+            return {"documents": documents}
         except Exception as e:
-            return {**state, "errors": state.get("errors", []) + [str(e)]}
+            return {"errors": [str(e)]}
     
-    async def _summarize_node(self, state: ResearchState) -> ResearchState:
+    async def _summarize_node(self, state: ResearchState) -> Dict[str, Any]:
         """Summarize node that extracts key information."""
         try:
             summaries = await self.summarizer_agent.process(state["documents"])
-            return {**state, "summaries": summaries}
-        except Exception as e:
-            return {**state, "errors": state.get("errors", []) + [str(e)]}
-    
-    async def _evaluate_node(self, state: ResearchState) -> ResearchState:
-        """Evaluate node that assesses document quality."""
-        try:
-            evaluations = await self.critic_agent.process(
-                state["documents"],
-                state["summaries"]
-            )
-            return {**state, "evaluations": evaluations}
+            return {"summaries": summaries}
         except Exception as e:
-            return {**state, "errors": state.get("errors", []) + [str(e)]}
+            return {"errors": [str(e)]}
     
-    async def _synthesize_node(self, state: ResearchState) -> ResearchState:
-        """Synthesize node that combines insights."""
-        try:
-            synthesis = await self.summarizer_agent.cross_document_synthesis(
-                state["summaries"]
-            )
-            return {**state, "synthesis": synthesis}
-        except Exception as e:
-            return {**state, "errors": state.get("errors", []) + [str(e)]}
+    async def _analyze_node(self, state: ResearchState) -> Dict[str, Any]:
+        """Analyze node that evaluates documents and synthesizes insights.
+        
+        Evaluation and synthesis both depend only on the summaries, so they
+        run concurrently instead of as two consecutive graph steps.
+        """
+        evaluations, synthesis = await asyncio.gather(
+            self.critic_agent.process(state["documents"], state["summaries"]),
+            self.summarizer_agent.cross_document_synthesis(state["summaries"]),
+            return_exceptions=True
+        )
+        
+        # Only return keys that were produced; failures keep the initial values
+        update = {"errors": []}
+        for key, result in (("evaluations", evaluations), ("synthesis", synthesis)):
+            if isinstance(result, Exception):
+                update["errors"].append(str(result))
+            else:
+                update[key] = result
+        
+        return update
     
-    async def _write_node(self, state: ResearchState) -> ResearchState:
+    async def _write_node(self, state: ResearchState) -> Dict[str, Any]:
         """Write node that generates the final report."""
         try:
             report = await self.writer_agent.process(
@@ -108,16 +129,16 @@ class ResearchCoordinator:
                 state["evaluations"],
                 state["synthesis"]
             )
-            return {**state, "report": report}
+            return {"report": report}
         except Exception as e:
-            return {**state, "errors": state.get("errors", []) + [str(e)]}
+            return {"errors": [str(e)]}
     
     async def process_query(self, query: str) -> Dict[str, Any]:
         """Process a research query through the workflow.
         
         Args:
             query: Research query to process
-            
+        
         Returns:
             Dictionary containing the results of the workflow
         """
@@ -133,6 +154,9 @@ class ResearchCoordinator:
         }
         
         # Run the workflow using the compiled app
-        final_state = await self.app.ainvoke(initial_state)
+        final_state = await self.app.ainvoke(
+            initial_state,
+            config={"configurable": {"coordinator": self}}
+        )
         
-        return final_state 
\ No newline at end of file
+        return final_state
\ No newline at end of file
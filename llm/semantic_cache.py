@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional
+import hashlib
+import numpy as np
+
+class SemanticCache:
+    """Two-tier response cache: exact content hash first, then embedding similarity."""
+    
+    def __init__(self, embeddings_manager: Optional[Any] = None, threshold: float = 0.95, max_entries: int = 1024):
+        """Initialize the cache.
+        
+        Args:
+            embeddings_manager: Embeddings manager used for similarity lookups.
+                              Without one, only exact matches are served.
+            threshold: Minimum cosine similarity for a semantic hit
+            max_entries: Maximum number of cached entries before the oldest is evicted
+        """
+        self.embeddings_manager = embeddings_manager
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._exact: Dict[bytes, Any] = {}
+        # Ring buffer of entries; _next is the slot overwritten by the next update
+        self._hashes: List[Optional[bytes]] = [None] * max_entries
+        self._contexts: List[Optional[str]] = [None] * max_entries
+        self._values: List[Any] = [None] * max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._has_vector = np.zeros(max_entries, dtype=bool)
+        self._next = 0
+        self._size = 0
+    
+    def embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embed texts in one batch for use with lookup() and update().
+        
+        This runs the embedding model, so async callers should call it off the event loop.
+        
+        Args:
+            texts: Texts to embed
+        
+        Returns:
+            Unit-length float32 rows, one per text, or None without an embeddings manager
+        """
+        if self.embeddings_manager is None or not texts:
+            return None
+        return np.asarray(self.embeddings_manager.get_embeddings(texts), dtype=np.float32)
+    
+    def lookup(self, text: str, context: str = "", vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """Look up a cached value.
+        
+        Semantic hits are only returned for entries stored under the same context,
+        so two different documents with similar text never share a result.
+        
+        Args:
+            text: Text the value was computed from
+            context: Identity of the source (e.g. document URL or title)
+            vector: Embedding of text from embed(); without it only exact matches are served
+        
+        Returns:
+            The cached value, or None on a miss
+        """
+        value = self._exact.get(self._hash(text, context))
+        if value is not None or vector is None or self._vectors is None:
+            return value
+        
+        candidates = [
+            i for i in range(self._size)
+            if self._has_vector[i] and self._contexts[i] == context
+        ]
+        if not candidates:
+            return None
+        
+        slots = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+        scores = self._vectors[slots] @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return self._values[slots[best]]
+        return None
+    
+    def update(self, text: str, value: Any, context: str = "", vector: Optional[np.ndarray] = None) -> None:
+        """Store a value.
+        
+        Args:
+            text: Text the value was computed from
+            value: Value to cache
+            context: Identity of the source (e.g. document URL or title)
+            vector: Embedding of text from embed(); without it the entry only serves exact matches
+        """
+        key = self._hash(text, context)
+        if key in self._exact:
+            return
+        
+        # Overwrite the oldest slot once the buffer is full
+        slot = self._next
+        evicted = self._hashes[slot]
+        if evicted is not None:
+            del self._exact[evicted]
+        
+        self._exact[key] = value
+        self._hashes[slot] = key
+        self._contexts[slot] = context
+        self._values[slot] = value
+        
+        if vector is not None:
+            if self._vectors is None:
+                self._vectors = np.empty((self.max_entries, vector.shape[-1]), dtype=np.float32)
+            self._vectors[slot] = vector
+        self._has_vector[slot] = vector is not None
+        
+        self._next = (slot + 1) % self.max_entries
+        self._size = min(self._size + 1, self.max_entries)
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._exact.clear()
+        self._hashes = [None] * self.max_entries
+        self._contexts = [None] * self.max_entries
+        self._values = [None] * self.max_entries
+        self._has_vector[:] = False
+        self._next = 0
+        self._size = 0
+    
+    @staticmethod
+    def _hash(text: str, context: str) -> bytes:
+        """Exact-match key for a (context, text) pair."""
+        return hashlib.sha256(f"{context}\0{text}".encode("utf-8")).digest()
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Process-wide UltraSafe LLM instance shared by all agents.
+"""
+
+import os
+from langchain.globals import set_llm_cache
+from config import settings
+from llm.ultrasafe_llm import UltraSafeLLM
+
+llm = UltraSafeLLM(
+    api_key=settings.ULTRASAFE_API_KEY,
+    model=settings.ULTRASAFE_MODEL,
+    temperature=settings.TEMPERATURE,
+    max_tokens=settings.MAX_TOKENS,
+    max_concurrency=settings.MAX_CONCURRENCY,
+    requests_per_minute=settings.ULTRASAFE_RPM,
+    compress_requests=settings.ULTRASAFE_COMPRESS_REQUESTS
+)
+
+def configure_llm_cache() -> None:
+    """Install the global LLM response cache, if enabled.
+    
+    Called by the application entry points at startup rather than on import,
+    so importing the agents doesn't create cache files.
+    """
+    if not settings.ENABLE_LLM_CACHE:
+        return
+    
+    # Identical prompts are answered from the cache instead of the UltraSafe API.
+    # Use Redis when several processes should share one cache.
+    if settings.LLM_CACHE_REDIS_URL:
+        import redis
+        from langchain_community.cache import RedisCache
+        set_llm_cache(RedisCache(redis.Redis.from_url(settings.LLM_CACHE_REDIS_URL)))
+    else:
+        from langchain_community.cache import SQLiteCache
+        os.makedirs(settings.CACHE_DIR, exist_ok=True)
+        set_llm_cache(SQLiteCache(os.path.join(settings.CACHE_DIR, "llm_cache.db")))
\ No newline at end of file
@@ -1,9 +1,125 @@
-from typing import Any, List, Optional, Dict
+from typing import Any, AsyncIterator, List, Optional, Dict, Tuple
 from langchain.llms.base import LLM
-from langchain.callbacks.manager import CallbackManagerForLLMRun
+from langchain.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain.schema import Generation, LLMResult
+import aiohttp
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+import gzip
+import hashlib
+import random
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from pydantic import BaseModel, Field
-import json
+import orjson
+
+# Connection pools shared by every UltraSafeLLM instance, so keep-alive
+# connections and TLS sessions are reused across calls.
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_session: Optional[requests.Session] = None
+# Bounds in-flight API calls across every caller on the event loop
+_call_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Request bodies at least this large are gzip-compressed when compression is enabled
+_GZIP_MIN_BYTES = 16 * 1024
+
+class RateLimiter:
+    """Token bucket allowing at most `rate` API calls per `period` seconds, with bursts up to `rate`."""
+    
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+    
+    async def acquire(self) -> None:
+        """Wait until a call may be made, then consume one token."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+# Shared by every UltraSafeLLM instance, since the provider limit is per API key
+_rate_limiter: Optional[RateLimiter] = None
+
+def _get_rate_limiter(requests_per_minute: int) -> RateLimiter:
+    """Return the shared rate limiter, creating it on first use."""
+    global _rate_limiter
+    if _rate_limiter is None or _rate_limiter.rate != requests_per_minute:
+        _rate_limiter = RateLimiter(requests_per_minute)
+    return _rate_limiter
+
+def _retry_delay(attempt: int, retry_after: Optional[str]) -> float:
+    """Seconds to wait before retrying a rate-limited request.
+    
+    Honors the server's Retry-After header, otherwise backs off exponentially
+    with full jitter so concurrent callers do not retry in lockstep.
+    """
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(30.0, 2 ** attempt))
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session for the running event loop."""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+    return _session
+
+def _get_call_semaphore(limit: int) -> asyncio.Semaphore:
+    """Return the semaphore limiting concurrent API calls on the running event loop."""
+    global _call_semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _call_semaphore is None or _semaphore_loop is not loop:
+        _call_semaphore = asyncio.Semaphore(limit)
+        _semaphore_loop = loop
+    return _call_semaphore
+
+def _get_sync_session() -> requests.Session:
+    """Return the shared requests session."""
+    global _sync_session
+    if _sync_session is None:
+        _sync_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64)
+        _sync_session.mount("https://", adapter)
+        _sync_session.mount("http://", adapter)
+    return _sync_session
+
+async def close_sessions() -> None:
+    """Close the shared HTTP sessions."""
+    global _session, _sync_session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    if _sync_session is not None:
+        _sync_session.close()
+        _sync_session = None
+
+@atexit.register
+def _close_sessions_at_exit() -> None:
+    """Close the shared sessions if the application did not."""
+    if _sync_session is not None:
+        _sync_session.close()
+    if (
+        _session is not None and not _session.closed
+        and _session_loop is not None
+        and not _session_loop.is_closed() and not _session_loop.is_running()
+    ):
+        _session_loop.run_until_complete(_session.close())
 
 class UltraSafeLLM(LLM, BaseModel):
     """UltraSafe LLM wrapper for LangChain."""
@@ -13,12 +129,48 @@ class UltraSafeLLM(LLM, BaseModel):
     api_key: str
     temperature: float = Field(default=0.7)
     max_tokens: int = Field(default=1000)
+    # Maximum API calls in flight at once, shared by all callers on the event loop
+    max_concurrency: int = Field(default=8)
+    enable_cache: bool = Field(default=True)
+    # Client-side rate limit shared by all instances; None disables it
+    requests_per_minute: Optional[int] = Field(default=None)
+    # Retries for rate-limited (HTTP 429) responses
+    max_retries: int = Field(default=3)
+    # Gzip large request bodies; only enable if the API accepts Content-Encoding: gzip
+    compress_requests: bool = Field(default=False)
+    # Optional SemanticCache consulted for near-duplicate prompts when temperature is 0
+    semantic_cache: Optional[Any] = Field(default=None, exclude=True)
+    
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        # Request parts that never change between calls, built once rather than per request
+        object.__setattr__(self, "_headers", {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+        object.__setattr__(self, "_base_payload", {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        })
+        # Requests in flight, keyed by event loop and prompt, so duplicates share one call
+        object.__setattr__(self, "_inflight", {})
     
     @property
     def _llm_type(self) -> str:
         """Return the type of LLM."""
         return "ultrasafe"
     
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        """Parameters that distinguish this LLM's responses, used as part of the cache key."""
+        return {
+            "api_url": self.api_url,
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+    
     def _call(
         self,
         prompt: str,
@@ -27,28 +179,31 @@ class UltraSafeLLM(LLM, BaseModel):
         **kwargs: Any,
     ) -> str:
         """Call the UltraSafe API."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens
-        }
+        data = {**self._base_payload, "messages": [{"role": "user", "content": prompt}]}
         
         if stop:
             data["stop"] = stop
+        
+        vector = self._semantic_cache_vector(prompt)
+        cached = self._semantic_cache_lookup(prompt, stop, vector)
+        if cached is not None:
+            return cached
             
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            body, headers = self._encode_request(data)
+            for attempt in range(self.max_retries + 1):
+                response = _get_sync_session().post(self.api_url, headers=headers, data=body)
+                if response.status_code != 429 or attempt == self.max_retries:
+                    break
+                time.sleep(_retry_delay(attempt, response.headers.get("Retry-After")))
             response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            result = orjson.loads(response.content)
+            content = result["choices"][0]["message"]["content"]
         except Exception as e:
             raise Exception(f"Error calling UltraSafe API: {str(e)}")
+        
+        self._semantic_cache_update(prompt, stop, content, vector)
+        return content
     
     async def _acall(
         self,
@@ -58,28 +213,139 @@ class UltraSafeLLM(LLM, BaseModel):
         **kwargs: Any,
     ) -> str:
         """Async call to the UltraSafe API."""
-        import aiohttp
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
         
-        data = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens
-        }
+        data = {**self._base_payload, "messages": [{"role": "user", "content": prompt}]}
         
         if stop:
             data["stop"] = stop
-            
+        
+        # Embed the prompt once, off the event loop, for both the lookup and the update
+        vector = None
+        if self._semantic_cache_enabled():
+            vector = await asyncio.to_thread(self._semantic_cache_vector, prompt)
+        cached = self._semantic_cache_lookup(prompt, stop, vector)
+        if cached is not None:
+            return cached
+        
+        # An identical prompt already in flight is awaited instead of sent again
+        key = (asyncio.get_running_loop(), hashlib.sha1(f"{stop}\0{prompt}".encode("utf-8")).digest())
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        pending = asyncio.ensure_future(self._apost(data))
+        self._inflight[key] = pending
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.api_url, headers=headers, json=data) as response:
-                    response.raise_for_status()
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"]
+            content = await asyncio.shield(pending)
+        finally:
+            del self._inflight[key]
+        
+        self._semantic_cache_update(prompt, stop, content, vector)
+        return content
+    
+    async def _apost(self, data: Dict[str, Any]) -> str:
+        """Send one chat completion request and return the message content."""
+        try:
+            async with self._send(data) as response:
+                result = orjson.loads(await response.read())
+            return result["choices"][0]["message"]["content"]
         except Exception as e:
-            raise Exception(f"Error calling UltraSafe API: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error calling UltraSafe API: {str(e)}")
+    
+    @asynccontextmanager
+    async def _send(self, data: Dict[str, Any]) -> AsyncIterator[aiohttp.ClientResponse]:
+        """POST a request under the shared rate limit and concurrency cap, retrying 429s.
+        
+        Yields:
+            The successful response; its call slot is held until the context exits
+        """
+        body, headers = self._encode_request(data)
+        session = await _get_session()
+        for attempt in range(self.max_retries + 1):
+            if self.requests_per_minute:
+                await _get_rate_limiter(self.requests_per_minute).acquire()
+            async with _get_call_semaphore(self.max_concurrency):
+                async with session.post(self.api_url, headers=headers, data=body) as response:
+                    if response.status != 429 or attempt == self.max_retries:
+                        response.raise_for_status()
+                        yield response
+                        return
+                    delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+            # Back off outside the semaphore so other calls can proceed
+            await asyncio.sleep(delay)
+    
+    def _encode_request(self, data: Dict[str, Any]) -> Tuple[bytes, Dict[str, str]]:
+        """Serialize a request body, gzip-compressing it when it is large.
+        
+        Returns:
+            The body bytes and the headers to send with them
+        """
+        body = orjson.dumps(data)
+        if not self.compress_requests or len(body) < _GZIP_MIN_BYTES:
+            return body, self._headers
+        return gzip.compress(body, compresslevel=5), {**self._headers, "Content-Encoding": "gzip"}
+    
+    def _semantic_cache_enabled(self) -> bool:
+        """Whether near-duplicate prompts may be answered from the semantic cache.
+        
+        Exact repeats are already served by LangChain's global LLM cache; the
+        semantic tier is only safe when sampling is deterministic.
+        """
+        return self.enable_cache and self.semantic_cache is not None and self.temperature == 0
+    
+    def _semantic_cache_context(self, stop: Optional[List[str]]) -> str:
+        """Cache context so responses are never shared across model settings."""
+        return f"{self.model}|{self.max_tokens}|{stop}"
+    
+    def _semantic_cache_vector(self, prompt: str) -> Optional[Any]:
+        """Embed a prompt for the semantic tier, or return None when it can't be matched safely.
+        
+        The embedding model truncates long inputs, and prompts built from the same
+        template share long prefixes, so a truncated embedding could match another
+        prompt's answer. Such prompts are only served by exact matches.
+        """
+        if not self._semantic_cache_enabled():
+            return None
+        embeddings_manager = self.semantic_cache.embeddings_manager
+        if embeddings_manager is None or not embeddings_manager.fits_max_length(prompt):
+            return None
+        return self.semantic_cache.embed([prompt])[0]
+    
+    def _semantic_cache_lookup(self, prompt: str, stop: Optional[List[str]], vector: Optional[Any]) -> Optional[str]:
+        """Return a cached response for the same or a similar prompt, if any."""
+        if not self._semantic_cache_enabled():
+            return None
+        return self.semantic_cache.lookup(prompt, context=self._semantic_cache_context(stop), vector=vector)
+    
+    def _semantic_cache_update(
+        self,
+        prompt: str,
+        stop: Optional[List[str]],
+        content: str,
+        vector: Optional[Any]
+    ) -> None:
+        """Store a response in the semantic cache, reusing the prompt's lookup vector."""
+        if self._semantic_cache_enabled():
+            self.semantic_cache.update(prompt, content, context=self._semantic_cache_context(stop), vector=vector)
+    
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Run a batch of prompts concurrently; _acall bounds how many are in flight.
+        
+        An LLMResult can't carry per-prompt failures, so a failed prompt fails the
+        batch. Callers that need per-prompt isolation should gather ainvoke calls.
+        """
+        texts = await asyncio.gather(
+            *[self._acall(prompt, stop=stop, run_manager=run_manager, **kwargs) for prompt in prompts],
+            return_exceptions=True
+        )
+        # Raise only once every call has settled, so none is left running unobserved
+        for text in texts:
+            if isinstance(text, Exception):
+                raise text
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
\ No newline at end of file
@@ -6,10 +6,19 @@ from agents.summarizer_agent import SummarizerAgent
 from agents.critic_agent import CriticAgent
 from agents.writer_agent import WriterAgent
 from graph.coordinator import ResearchCoordinator
+from llm.semantic_cache import SemanticCache
+from llm.shared import llm, configure_llm_cache
+from llm.ultrasafe_llm import close_sessions
 from rag.embeddings import EmbeddingsManager
 from rag.retriever import HybridRetriever
 from utils.pdf_parser import PDFParser
 
+try:
+    # libuv-based event loop; much faster for the many concurrent HTTP calls
+    import uvloop
+except ImportError:
+    uvloop = None
+
 async def process_research_query(coordinator: ResearchCoordinator, query: str) -> None:
     """Process a single research query and display results.
     
@@ -50,16 +59,18 @@ async def main():
     """Main entry point for the research assistant."""
     # Load environment variables
     load_dotenv()
+    configure_llm_cache()
     
     # Initialize components
     embeddings_manager = EmbeddingsManager()
     retriever = HybridRetriever(embeddings_manager)
     pdf_parser = PDFParser()
+    llm.semantic_cache = SemanticCache(embeddings_manager)
     
     # Initialize agents
     research_agent = ResearchAgent(retriever, pdf_parser)
     summarizer_agent = SummarizerAgent()
-    critic_agent = CriticAgent()
+    critic_agent = CriticAgent(cache=SemanticCache(embeddings_manager))
     writer_agent = WriterAgent()
     
     # Initialize coordinator
@@ -106,9 +117,16 @@ async def main():
         except Exception as e:
             print(f"\nAn error occurred: {str(e)}")
             print("Please try again with a different query.")
+    
+    # Release pooled HTTP connections
+    await retriever.web_search.close()
+    await close_sessions()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("\n\nResearch Assistant terminated. Goodbye!") 
\ No newline at end of file
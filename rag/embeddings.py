@@ -1,57 +1,119 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+import sentence_transformers
 from sentence_transformers import SentenceTransformer
+from packaging.version import Version
 import numpy as np
+import torch
+import contextlib
 import os
+import threading
 from dotenv import load_dotenv
 
+try:
+    # SIMD similarity kernels (AVX-512/NEON); NumPy is used when unavailable
+    import simsimd
+except ImportError:
+    simsimd = None
+
+# Loaded models shared by every EmbeddingsManager in the process,
+# keyed by (model name, backend, requested precision). Each model has a lock, since its
+# fast tokenizer fails with "Already borrowed" when used from several threads at once.
+_MODEL_CACHE: Dict[Tuple[str, str, str], Tuple[SentenceTransformer, str, threading.Lock]] = {}
+
 class EmbeddingsManager:
     """Manages text embeddings using Sentence Transformers."""
     
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, precision: str = None, backend: str = None):
         """Initialize the embeddings manager.
         
         Args:
             model_name: Name of the Sentence Transformer model to use.
                       Defaults to environment variable or 'all-MiniLM-L6-v2'
+            precision: Inference precision: 'auto', 'int8', 'bf16' or 'fp32'.
+                      'auto' picks bf16 on CPUs with AMX and int8 on other CPUs.
+                      Reduced precisions are opt-in until their fidelity against
+                      fp32 is measured. Defaults to environment variable or 'fp32'
+            backend: Inference backend, 'torch' or 'onnx'.
+                      Defaults to environment variable or 'torch'
         """
         load_dotenv()
         self.model_name = model_name or os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2")
-        self.model = SentenceTransformer(self.model_name)
+        self.backend = backend or os.getenv("EMBEDDINGS_BACKEND", "torch")
+        precision = precision or os.getenv("EMBEDDINGS_PRECISION", "fp32")
+        
+        # Reuse an already loaded model rather than keeping another copy in memory
+        cache_key = (self.model_name, self.backend, precision)
+        if cache_key not in _MODEL_CACHE:
+            self._load_model(precision)
+            _MODEL_CACHE[cache_key] = (self.model, self.precision, threading.Lock())
+        self.model, self.precision, self._lock = _MODEL_CACHE[cache_key]
     
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _load_model(self, precision: str) -> None:
+        """Load the model and apply the requested precision.
+        
+        Args:
+            precision: Requested precision
+        """
+        if self.backend == "torch":
+            self.model = SentenceTransformer(self.model_name)
+        else:
+            if Version(sentence_transformers.__version__) < Version("3.2"):
+                raise ImportError(
+                    f"The '{self.backend}' embeddings backend requires sentence-transformers>=3.2 "
+                    f"(found {sentence_transformers.__version__}); "
+                    f"install it with: pip install \"sentence-transformers[{self.backend}]>=3.2\""
+                )
+            # Exports the model on first use; ONNX Runtime applies its graph optimizations at load
+            self.model = SentenceTransformer(self.model_name, backend=self.backend)
+        self.precision = self._resolve_precision(precision)
+        
+        if self.precision == "int8":
+            # Dynamic INT8 quantization of the Linear layers, which dominate CPU inference
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+    
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts.
         
         Args:
             texts: List of texts to generate embeddings for
             
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), embedding dimension), rows L2-normalized
         """
         try:
-            # Generate embeddings
-            embeddings = self.model.encode(texts)
+            # encode() sorts texts by length before batching, so each batch pads
+            # to similar lengths; results are returned in the original order.
+            # Unit-length rows let callers score with a plain dot product.
+            embeddings = self._encode(
+                texts,
+                batch_size=64,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
             
-            # Convert to list of lists
-            return embeddings.tolist()
+            # Keep the array; converting to lists boxes every float into a Python object
+            return embeddings.astype(np.float32, copy=False)
             
         except Exception as e:
             raise Exception(f"Error generating embeddings: {str(e)}")
     
-    def get_embedding(self, text: str) -> List[float]:
+    def get_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text.
         
         Args:
             text: Text to generate embedding for
             
         Returns:
-            Embedding vector
+            L2-normalized float32 embedding vector
         """
         try:
             # Generate embedding
-            embedding = self.model.encode(text)
+            embedding = self._encode(text, convert_to_numpy=True, normalize_embeddings=True)
             
-            # Convert to list
-            return embedding.tolist()
+            return embedding.astype(np.float32, copy=False)
             
         except Exception as e:
             raise Exception(f"Error generating embedding: {str(e)}")
@@ -67,20 +129,61 @@ class EmbeddingsManager:
             Similarity score (0-1)
         """
         try:
-            # Generate embeddings
-            embedding1 = self.model.encode(text1)
-            embedding2 = self.model.encode(text2)
+            # Encode both texts in one batch. SimSIMD fuses the norms into its single pass;
+            # otherwise unit-length vectors make cosine a plain dot product
+            embeddings = self._encode(
+                [text1, text2],
+                convert_to_numpy=True,
+                normalize_embeddings=simsimd is None
+            ).astype(np.float32, copy=False)
             
-            # Compute cosine similarity
-            similarity = np.dot(embedding1, embedding2) / (
-                np.linalg.norm(embedding1) * np.linalg.norm(embedding2)
-            )
-            
-            return float(similarity)
+            if simsimd is not None:
+                # simsimd.cosine returns the cosine distance
+                return 1.0 - float(simsimd.cosine(embeddings[0], embeddings[1]))
+            return float(embeddings[0] @ embeddings[1])
             
         except Exception as e:
             raise Exception(f"Error computing similarity: {str(e)}")
     
+    def fits_max_length(self, text: str) -> bool:
+        """Check whether a text is embedded whole rather than truncated.
+        
+        Args:
+            text: Text to check
+            
+        Returns:
+            True if the text's tokens fit within the model's max_seq_length
+        """
+        with self._lock:
+            input_ids = self.model.tokenizer(text)["input_ids"]
+        return len(input_ids) <= self.model.max_seq_length
+    
+    def _resolve_precision(self, precision: str) -> str:
+        """Resolve the requested precision to one the current device supports.
+        
+        Args:
+            precision: Requested precision
+            
+        Returns:
+            Precision to run with
+        """
+        if self.backend != "torch" or self.model.device.type != "cpu":
+            # Quantization and bf16 autocast paths here target CPU PyTorch inference only
+            return "fp32"
+        if precision == "auto":
+            amx_supported = getattr(torch.cpu, "_is_amx_tile_supported", lambda: False)()
+            return "bf16" if amx_supported else "int8"
+        return precision
+    
+    def _encode(self, *args, **kwargs):
+        """Run model.encode under the configured runtime precision."""
+        if self.precision == "bf16":
+            context = torch.autocast(device_type="cpu", dtype=torch.bfloat16)
+        else:
+            context = contextlib.nullcontext()
+        with self._lock, context:
+            return self.model.encode(*args, **kwargs)
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model.
         
@@ -89,6 +192,8 @@ class EmbeddingsManager:
         """
         return {
             "model_name": self.model_name,
+            "backend": self.backend,
+            "precision": self.precision,
             "embedding_dimension": self.model.get_sentence_embedding_dimension(),
             "max_sequence_length": self.model.max_seq_length
         } 
\ No newline at end of file
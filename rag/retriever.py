@@ -1,6 +1,10 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterable, AsyncIterator, Iterable, Union
+from collections import OrderedDict
+import asyncio
+import heapq
+import numpy as np
 from langchain.schema import Document
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, models
 from .embeddings import EmbeddingsManager
 from .web_search import WebSearch
 import os
@@ -19,54 +23,113 @@ class HybridRetriever:
         self.embeddings_manager = embeddings_manager
         self.qdrant_client = QdrantClient(
             url=os.getenv("QDRANT_URL"),
-            api_key=os.getenv("QDRANT_API_KEY")
+            api_key=os.getenv("QDRANT_API_KEY"),
+            # Protobuf over gRPC is much cheaper than JSON over REST for bulk uploads
+            prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"
         )
         self.collection_name = "academic_papers"
         self.web_search = WebSearch()
+        # Documents embedded and uploaded per step of initialize()
+        self.index_chunk_size = 256
+        # Set once the collection is known to exist, so later initialize() calls skip the check
+        self._collection_ready = False
+        self._query_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_embedding_cache_size = 1024
     
-    async def initialize(self, documents: List[Document]) -> None:
+    async def initialize(self, documents: Union[Iterable[Document], AsyncIterable[Document]]) -> None:
         """Initialize the retriever with documents.
         
         Args:
-            documents: List of documents to index
+            documents: Documents to index. An async iterable is indexed as it
+                      produces documents, so loading overlaps with embedding.
         """
         try:
-            # Generate embeddings
-            texts = [doc.page_content for doc in documents]
-            embeddings = self.embeddings_manager.get_embeddings(texts)
-            
-            # Prepare points for Qdrant
-            points = []
-            for i, (doc, embedding) in enumerate(zip(documents, embeddings)):
-                points.append({
-                    "id": i,
-                    "vector": embedding,
-                    "payload": {
-                        "text": doc.page_content,
-                        "metadata": doc.metadata
-                    }
-                })
-            
-            # Create collection if it doesn't exist
-            collections = self.qdrant_client.get_collections().collections
-            if not any(c.name == self.collection_name for c in collections):
-                self.qdrant_client.create_collection(
+            # Embed and upload in chunks so only one chunk of vectors is held in memory
+            start = 0
+            async for chunk in self._chunks(documents):
+                # Generate embeddings off the event loop so producers keep running
+                texts = [doc.page_content for doc in chunk]
+                embeddings = await asyncio.to_thread(self.embeddings_manager.get_embeddings, texts)
+                
+                # Prepare payloads for Qdrant; vectors are passed as the array itself
+                payloads = [
+                    {"text": doc.page_content, "metadata": doc.metadata}
+                    for doc in chunk
+                ]
+                
+                if start == 0:
+                    self._ensure_collection(embeddings.shape[1])
+                
+                # One chunk is one batch; a worker pool per chunk would cost more than it saves
+                await asyncio.to_thread(
+                    self.qdrant_client.upload_collection,
                     collection_name=self.collection_name,
-                    vectors_config={
-                        "size": len(embeddings[0]),
-                        "distance": "Cosine"
-                    }
+                    vectors=embeddings,
+                    payload=payloads,
+                    ids=list(range(start, start + len(chunk))),
+                    batch_size=self.index_chunk_size,
+                    parallel=1
                 )
-            
-            # Upload points
-            self.qdrant_client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
+                start += len(chunk)
             
         except Exception as e:
             raise Exception(f"Error initializing retriever: {str(e)}")
     
+    async def _chunks(
+        self,
+        documents: Union[Iterable[Document], AsyncIterable[Document]]
+    ) -> AsyncIterator[List[Document]]:
+        """Group documents into lists of at most index_chunk_size.
+        
+        Args:
+            documents: Documents, from a plain or async iterable
+            
+        Yields:
+            Consecutive chunks of documents
+        """
+        chunk: List[Document] = []
+        if isinstance(documents, AsyncIterable):
+            async for doc in documents:
+                chunk.append(doc)
+                if len(chunk) == self.index_chunk_size:
+                    yield chunk
+                    chunk = []
+        else:
+            for doc in documents:
+                chunk.append(doc)
+                if len(chunk) == self.index_chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    
+    def _ensure_collection(self, vector_size: int) -> None:
+        """Create the collection if it doesn't exist.
+        
+        Args:
+            vector_size: Dimension of the stored embeddings
+        """
+        if self._collection_ready:
+            return
+        
+        if not self.qdrant_client.collection_exists(self.collection_name):
+            self.qdrant_client.create_collection(
+                collection_name=self.collection_name,
+                # Embeddings are unit-length, so dot product equals cosine without per-query normalization
+                vectors_config={
+                    "size": vector_size,
+                    "distance": "Dot"
+                },
+                # int8 vectors in RAM for the HNSW search; originals are kept for rescoring
+                quantization_config=models.ScalarQuantization(
+                    scalar=models.ScalarQuantizationConfig(
+                        type=models.ScalarType.INT8,
+                        always_ram=True
+                    )
+                )
+            )
+        self._collection_ready = True
+    
     async def retrieve(self, query: str, limit: int = 10, include_web: bool = True) -> List[Document]:
         """Retrieve relevant documents.
         
@@ -82,11 +145,15 @@ class HybridRetriever:
             documents = []
             
             # Get documents from Qdrant
-            query_embedding = self.embeddings_manager.get_embedding(query)
+            query_embedding = await self._embed_query(query)
             search_result = self.qdrant_client.search(
                 collection_name=self.collection_name,
                 query_vector=query_embedding,
-                limit=limit
+                limit=limit,
+                # Oversample on the quantized vectors, then rescore with the originals to keep recall
+                search_params=models.SearchParams(
+                    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+                )
             )
             
             # Convert Qdrant results to documents
@@ -101,22 +168,50 @@ class HybridRetriever:
             
             # Add web search results if requested
             if include_web:
-                web_docs = self.web_search.search_and_extract(query, max_results=limit)
-                documents.extend(web_docs)
-            
-            # Sort by relevance score if available
-            documents.sort(key=lambda x: x.metadata.get("relevance_score", 0), reverse=True)
+                web_docs = await self.web_search.search_and_extract(query, max_results=limit)
+                if web_docs:
+                    # Score snippets against the query on the same cosine scale as the database hits,
+                    # so web results neither sink unscored nor crowd out better database matches
+                    snippets = [doc.metadata.get("snippet") or doc.metadata.get("title", "") for doc in web_docs]
+                    snippet_embeddings = await asyncio.to_thread(self.embeddings_manager.get_embeddings, snippets)
+                    scores = snippet_embeddings @ query_embedding
+                    for doc, score in zip(web_docs, scores.tolist()):
+                        doc.metadata["relevance_score"] = score
+                    documents.extend(web_docs)
             
-            return documents[:limit]
+            # Keep the best `limit` documents without sorting the whole list
+            return heapq.nlargest(limit, documents, key=lambda x: x.metadata.get("relevance_score", 0))
             
         except Exception as e:
             raise Exception(f"Error retrieving documents: {str(e)}")
     
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query, reusing the vector for repeated queries.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Query embedding
+        """
+        embedding = self._query_embedding_cache.get(query)
+        if embedding is not None:
+            self._query_embedding_cache.move_to_end(query)
+            return embedding
+        
+        # The cache itself is only touched on the event loop; the model runs in a thread
+        embedding = await asyncio.to_thread(self.embeddings_manager.get_embedding, query)
+        self._query_embedding_cache[query] = embedding
+        if len(self._query_embedding_cache) > self._query_embedding_cache_size:
+            self._query_embedding_cache.popitem(last=False)
+        return embedding
+    
     async def delete_collection(self) -> None:
         """Delete the collection."""
         try:
             self.qdrant_client.delete_collection(
                 collection_name=self.collection_name
             )
+            self._collection_ready = False
         except Exception as e:
             raise Exception(f"Error deleting collection: {str(e)}") 
\ No newline at end of file
@@ -1,10 +1,14 @@
-from typing import List, Dict, Any
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, AsyncIterator
+import aiohttp
+import asyncio
+from contextlib import asynccontextmanager
 from langchain.schema import Document
+from selectolax.lexbor import LexborHTMLParser
 import re
 from urllib.parse import urlparse
-import time
+
+_RE_BLANK_LINES = re.compile(r'\n\s*\n')
+_RE_WHITESPACE = re.compile(r'\s+')
 
 class WebSearch:
     """Web search and content retrieval using DuckDuckGo."""
@@ -14,39 +18,52 @@ class WebSearch:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        # Maximum pages fetched at once, and minimum seconds between requests to one host
+        self.max_concurrent_fetches = 5
+        self.host_interval = 1.0
+        self._host_next_slot: Dict[str, float] = {}
+        # Attempts after the first for failed fetches, with exponential backoff
+        self.max_retries = 2
+        self.retry_backoff = 0.3
+        # Keep-alive session shared by every search, created lazily on the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
     
-    def search(self, query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    async def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> List[Dict[str, str]]:
         """Search the web using DuckDuckGo.
         
         Args:
             query: Search query
             max_results: Maximum number of results to return
+            session: HTTP session to reuse; the shared session is used if omitted
             
         Returns:
             List of search results with title, link, and snippet
         """
         try:
-            # Construct DuckDuckGo search URL
-            search_url = f"https://html.duckduckgo.com/html/?q={query}"
-            
             # Make request
-            response = requests.get(search_url, headers=self.headers)
-            response.raise_for_status()
+            async with self._session_scope(session) as session:
+                html = await self._fetch(session, "https://html.duckduckgo.com/html/", params={"q": query})
             
             # Parse results
-            soup = BeautifulSoup(response.text, 'html.parser')
+            tree = LexborHTMLParser(html)
             results = []
             
             # Extract search results
-            for result in soup.select('.result')[:max_results]:
-                title_elem = result.select_one('.result__title')
-                snippet_elem = result.select_one('.result__snippet')
-                link_elem = result.select_one('.result__url')
+            for result in tree.css('.result')[:max_results]:
+                title_elem = result.css_first('.result__title')
+                snippet_elem = result.css_first('.result__snippet')
+                link_elem = result.css_first('.result__url')
                 
                 if title_elem and snippet_elem and link_elem:
-                    title = title_elem.get_text(strip=True)
-                    snippet = snippet_elem.get_text(strip=True)
-                    link = link_elem.get_text(strip=True)
+                    title = title_elem.text(strip=True)
+                    snippet = snippet_elem.text(strip=True)
+                    link = link_elem.text(strip=True)
                     
                     results.append({
                         'title': title,
@@ -59,11 +76,12 @@ class WebSearch:
         except Exception as e:
             raise Exception(f"Error searching web: {str(e)}")
     
-    def extract_content(self, url: str) -> str:
+    async def extract_content(self, url: str, session: Optional[aiohttp.ClientSession] = None) -> str:
         """Extract main content from a webpage.
         
         Args:
             url: URL to extract content from
+            session: HTTP session to reuse; the shared session is used if omitted
             
         Returns:
             Extracted text content
@@ -74,29 +92,41 @@ class WebSearch:
                 url = 'https://' + url
             
             # Make request
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            # Parse content
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove unwanted elements
-            for element in soup(['script', 'style', 'nav', 'footer', 'header']):
-                element.decompose()
-            
-            # Extract text
-            text = soup.get_text(separator='\n', strip=True)
+            async with self._session_scope(session) as session:
+                html = await self._fetch(session, url)
             
-            # Clean up text
-            text = re.sub(r'\n\s*\n', '\n\n', text)  # Remove multiple newlines
-            text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-            
-            return text
+            # Parse off the event loop; large pages take a while
+            return await asyncio.to_thread(self._parse_content, html)
             
         except Exception as e:
             raise Exception(f"Error extracting content: {str(e)}")
     
-    def search_and_extract(self, query: str, max_results: int = 5) -> List[Document]:
+    def _parse_content(self, html: str) -> str:
+        """Extract readable text from an HTML page.
+        
+        Args:
+            html: Page HTML
+            
+        Returns:
+            Cleaned text content
+        """
+        # Parse content
+        tree = LexborHTMLParser(html)
+        
+        # Remove unwanted elements
+        tree.strip_tags(['script', 'style', 'nav', 'footer', 'header'])
+        
+        # Extract text
+        root = tree.body or tree.root
+        text = root.text(separator='\n', strip=True) if root else ""
+        
+        # Clean up text
+        text = _RE_BLANK_LINES.sub('\n\n', text)  # Remove multiple newlines
+        text = _RE_WHITESPACE.sub(' ', text)  # Normalize whitespace
+        
+        return text
+    
+    async def search_and_extract(self, query: str, max_results: int = 5) -> List[Document]:
         """Search the web and extract content from results.
         
         Args:
@@ -107,35 +137,91 @@ class WebSearch:
             List of documents with extracted content
         """
         try:
+            session = self._get_session()
+            
             # Search web
-            results = self.search(query, max_results)
-            documents = []
+            results = await self.search(query, max_results, session=session)
             
-            # Extract content from each result
-            for result in results:
+            # Extract content from all results concurrently
+            semaphore = asyncio.Semaphore(self.max_concurrent_fetches)
+            
+            async def extract(result: Dict[str, str]) -> Optional[Document]:
                 try:
-                    content = self.extract_content(result['link'])
-                    
-                    # Create document
-                    doc = Document(
-                        page_content=content,
-                        metadata={
-                            'title': result['title'],
-                            'url': result['link'],
-                            'snippet': result['snippet'],
-                            'source': 'web'
-                        }
-                    )
-                    documents.append(doc)
-                    
-                    # Be nice to servers
-                    time.sleep(1)
-                    
+                    async with semaphore:
+                        content = await self.extract_content(result['link'], session=session)
                 except Exception as e:
                     print(f"Error processing {result['link']}: {str(e)}")
-                    continue
+                    return None
+                
+                # Create document
+                return Document(
+                    page_content=content,
+                    metadata={
+                        'title': result['title'],
+                        'url': result['link'],
+                        'snippet': result['snippet'],
+                        'source': 'web'
+                    }
+                )
             
-            return documents
+            documents = await asyncio.gather(*[extract(result) for result in results])
+            
+            return [doc for doc in documents if doc is not None]
             
         except Exception as e:
-            raise Exception(f"Error in search and extract: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Error in search and extract: {str(e)}")
+    
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive session for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=16, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+            self._session_loop = loop
+        return self._session
+    
+    @asynccontextmanager
+    async def _session_scope(self, session: Optional[aiohttp.ClientSession]) -> AsyncIterator[aiohttp.ClientSession]:
+        """Yield the given session, or the shared one."""
+        yield session if session is not None else self._get_session()
+    
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, **kwargs: Any) -> str:
+        """GET a URL, spacing out requests to the same host to be nice to servers.
+        
+        Connection errors, timeouts and 5xx responses are retried with exponential backoff.
+        
+        Args:
+            session: HTTP session
+            url: URL to fetch
+            **kwargs: Extra arguments for session.get
+            
+        Returns:
+            Response body text
+        """
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_host(host)
+            try:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10), **kwargs) as response:
+                    response.raise_for_status()
+                    return await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+    
+    async def _wait_for_host(self, host: str) -> None:
+        """Wait for this host's next request slot and reserve the one after it."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._host_next_slot.get(host, 0.0))
+        self._host_next_slot[host] = slot + self.host_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
\ No newline at end of file
@@ -1,17 +1,19 @@
 import uvicorn
 from dotenv import load_dotenv
+from config import settings
 
 def main():
     """Run the FastAPI server."""
     # Load environment variables
     load_dotenv()
     
-    # Run server
+    # Run server; uvicorn picks uvloop and httptools automatically when they are installed
     uvicorn.run(
         "api.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        reload=settings.API_RELOAD,
+        workers=settings.API_WORKERS
     )
 
 if __name__ == "__main__":
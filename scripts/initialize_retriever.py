@@ -1,10 +1,35 @@
 import os
 import asyncio
+from typing import Any, AsyncIterator, Dict
 from dotenv import load_dotenv
 from langchain.schema import Document
 from rag.embeddings import EmbeddingsManager
 from rag.retriever import HybridRetriever
 
+def _read_text(file_path: str) -> str:
+    """Read a UTF-8 text file."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _parse_metadata(content: str) -> Dict[str, Any]:
+    """Extract metadata from the header lines of a document."""
+    metadata = {}
+    
+    for line in content.split("\n", 5)[:5]:  # First 5 lines contain metadata
+        if ":" in line:
+            key, value = line.split(":", 1)
+            key = key.strip().lower()
+            value = value.strip()
+            
+            if key == "authors":
+                value = [author.strip() for author in value.split(",")]
+            elif key == "year":
+                value = int(value)
+                
+            metadata[key] = value
+    
+    return metadata
+
 async def initialize_retriever():
     """Initialize the retriever with sample documents."""
     # Load environment variables
@@ -14,43 +39,34 @@ async def initialize_retriever():
     embeddings_manager = EmbeddingsManager()
     retriever = HybridRetriever(embeddings_manager)
     
-    # Read documents
-    documents = []
+    # Read documents concurrently, at most 16 files at a time
     docs_dir = "data/documents"
+    semaphore = asyncio.Semaphore(16)
     
-    for filename in os.listdir(docs_dir):
-        if filename.endswith(".txt"):
-            file_path = os.path.join(docs_dir, filename)
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                
-                # Extract metadata from content
-                lines = content.split("\n")
-                metadata = {}
-                
-                for line in lines[:5]:  # First 5 lines contain metadata
-                    if ":" in line:
-                        key, value = line.split(":", 1)
-                        key = key.strip().lower()
-                        value = value.strip()
-                        
-                        if key == "authors":
-                            value = [author.strip() for author in value.split(",")]
-                        elif key == "year":
-                            value = int(value)
-                            
-                        metadata[key] = value
-                
-                # Create document
-                doc = Document(
-                    page_content=content,
-                    metadata=metadata
-                )
-                documents.append(doc)
+    async def read(file_path: str) -> Document:
+        async with semaphore:
+            content = await asyncio.to_thread(_read_text, file_path)
+        
+        # Create document
+        return Document(
+            page_content=content,
+            metadata=_parse_metadata(content)
+        )
+    
+    reads = [
+        asyncio.ensure_future(read(os.path.join(docs_dir, filename)))
+        for filename in os.listdir(docs_dir)
+        if filename.endswith(".txt")
+    ]
+    
+    async def documents() -> AsyncIterator[Document]:
+        # Hand documents over as they finish, so reading overlaps with embedding
+        for read_task in asyncio.as_completed(reads):
+            yield await read_task
     
     # Initialize retriever
-    await retriever.initialize(documents)
-    print(f"Initialized retriever with {len(documents)} documents")
+    await retriever.initialize(documents())
+    print(f"Initialized retriever with {len(reads)} documents")
 
 if __name__ == "__main__":
     asyncio.run(initialize_retriever()) 
\ No newline at end of file
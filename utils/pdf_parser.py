@@ -1,8 +1,27 @@
+import asyncio
 import os
-from typing import Dict, Any, Optional
-import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+import fitz
 from langchain.schema import Document
 
+# PDFs with fewer pages are extracted in-process; the pool overhead is not worth it
+_PARALLEL_MIN_PAGES = 64
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Return the process pool used for page extraction, creating it on first use."""
+    global _page_pool
+    if _page_pool is None:
+        _page_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _page_pool
+
+def _extract_pages(file_path: str, start: int, stop: int) -> str:
+    """Extract the text of pages [start, stop) of a PDF in a worker process."""
+    with fitz.open(file_path) as doc:
+        return "\n".join(doc[i].get_text() for i in range(start, stop))
+
 class PDFParser:
     """Utility for parsing PDF documents."""
     
@@ -20,13 +39,15 @@ class PDFParser:
             Extracted text
         """
         try:
-            # Create a PDF reader object
-            pdf_reader = PyPDF2.PdfReader(content)
+            # Open in-memory bytes as a stream, anything else as a path
+            if isinstance(content, (bytes, bytearray)):
+                doc = fitz.open(stream=content, filetype="pdf")
+            else:
+                doc = fitz.open(content)
             
             # Extract text from each page
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            with doc:
+                text = "\n".join(page.get_text() for page in doc)
             
             return text.strip()
         except Exception as e:
@@ -50,23 +71,45 @@ class PDFParser:
             metadata = self._extract_metadata_from_filename(filename)
             
             # Read and process the PDF
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Extract text from each page
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                # Create document
-                return Document(
-                    page_content=text.strip(),
-                    metadata=metadata
-                )
+            with fitz.open(file_path) as doc:
+                num_pages = doc.page_count
+                if num_pages < _PARALLEL_MIN_PAGES:
+                    # Extract text from each page
+                    text = "\n".join(page.get_text() for page in doc)
+            
+            if num_pages >= _PARALLEL_MIN_PAGES:
+                text = await self._extract_pages_parallel(file_path, num_pages)
+            
+            # Create document
+            return Document(
+                page_content=text.strip(),
+                metadata=metadata
+            )
                 
         except Exception as e:
             raise Exception(f"Error processing PDF file: {str(e)}")
     
+    async def _extract_pages_parallel(self, file_path: str, num_pages: int) -> str:
+        """Extract the text of a large PDF across the process pool.
+        
+        Args:
+            file_path: Path to the PDF file
+            num_pages: Number of pages in the PDF
+            
+        Returns:
+            Text of all pages, in page order
+        """
+        pool = _get_page_pool()
+        
+        # One contiguous page range per worker, so each process opens the file once
+        step = -(-num_pages // (os.cpu_count() or 1))
+        loop = asyncio.get_running_loop()
+        parts: List[str] = await asyncio.gather(*(
+            loop.run_in_executor(pool, _extract_pages, file_path, start, min(start + step, num_pages))
+            for start in range(0, num_pages, step)
+        ))
+        return "\n".join(parts)
+    
     def _extract_metadata_from_filename(self, filename: str) -> Dict[str, Any]:
         """Extract metadata from filename.
         
@@ -112,20 +155,21 @@ class PDFParser:
             Dictionary containing metadata
         """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
+            with fitz.open(file_path) as doc:
                 # Get document info
-                info = pdf_reader.metadata
-                
-                metadata = {
-                    "title": info.get('/Title', ''),
-                    "authors": info.get('/Author', '').split(',') if info.get('/Author') else [],
-                    "year": info.get('/CreationDate', '')[:4] if info.get('/CreationDate') else '',
-                    "file_type": "pdf",
-                    "filename": os.path.basename(file_path)
-                }
-                
-                return metadata
+                info = doc.metadata or {}
+            
+            # PDF dates look like "D:YYYYMMDDHHmmSS"
+            creation_date = (info.get('creationDate') or '').removeprefix('D:')
+            
+            metadata = {
+                "title": info.get('title') or '',
+                "authors": info.get('author').split(',') if info.get('author') else [],
+                "year": creation_date[:4],
+                "file_type": "pdf",
+                "filename": os.path.basename(file_path)
+            }
+            
+            return metadata
         except Exception as e:
             return self._extract_metadata_from_filename(os.path.basename(file_path)) 
\ No newline at end of file